@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+"""
+Ingest path benchmark.
+
+Starts a scratch Redis, writes log events to the "test" stream with the
+log generator and splits them with the stream splitter, both imported
+from their service directories. Reports:
+
+- ingest events/sec of generate_messages and add_message
+- splitter events/sec draining the ingested backlog
+- end-to-end latency percentiles from event timestamp to the JSON
+  document being visible in its jsonIdx partition index, sampled with
+  probe events while the generator writes at a fixed rate
+- Redis memory per event for the stream and for everything the
+  splitter stores
+
+Results are written as JSON to benchmarks/results/ with the commit they
+were measured on, compare two of them with the compare subcommand.
+
+The server is redis-stack-server by default. Plain redis-server works
+with the modules given by --module. --stand-in runs a fakeredis server
+instead when no modules are at hand; search isn't available there, so
+documents count as visible once their key exists and the numbers only
+compare to other stand-in runs.
+
+Usage:
+    python benchmarks/ingest.py run [--events 100000] [--rate 5000] [--duration 10]
+    python benchmarks/ingest.py run --server redis-server --module /path/rejson.so ...
+    python benchmarks/ingest.py run --stand-in
+    python benchmarks/ingest.py compare OLD.json NEW.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from redis import ResponseError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+STREAM = 'test'
+
+# Metrics shown by compare, higher is better unless listed in LOWER_IS_BETTER
+METRICS = (
+    ("ingest", "generate_events_per_sec"),
+    ("ingest", "add_message_events_per_sec"),
+    ("splitter", "events_per_sec"),
+    ("latency_ms", "p50"),
+    ("latency_ms", "p90"),
+    ("latency_ms", "p99"),
+    ("memory", "stream_bytes_per_event"),
+    ("memory", "total_bytes_per_event")
+)
+LOWER_IS_BETTER = {"latency_ms", "memory"}
+
+def free_port() -> int:
+    """ Return a free TCP port on localhost. """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(args, port: int) -> subprocess.Popen:
+    """ Start scratch Redis or the fakeredis stand-in on port. """
+    if args.stand_in:
+        code = (
+            "from fakeredis import TcpFakeServer; "
+            f"TcpFakeServer(('127.0.0.1', {port}), server_type='redis').serve_forever()"
+        )
+        return subprocess.Popen([sys.executable, '-c', code])
+    command = [
+        args.server, '--port', str(port), '--save', '', '--appendonly', 'no',
+        '--dir', tempfile.mkdtemp(prefix='ingest-benchmark-')
+    ]
+    for module in args.module:
+        command += ['--loadmodule', module]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+def git_commit() -> dict:
+    """ Return commit of the working tree and whether it has changes. """
+    def git(*command):
+        return subprocess.run(
+            ['git', *command], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    return {"commit": git('rev-parse', 'HEAD'), "dirty": bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+def percentiles(values: list) -> dict:
+    """ Return p50, p90, p99 and max of values. """
+    values = sorted(values)
+    if not values:
+        return {}
+    result = {
+        f"p{p}": round(values[min(len(values) - 1, len(values) * p // 100)], 2)
+        for p in (50, 90, 99)
+    }
+    result["max"] = round(values[-1], 2)
+    result["samples"] = len(values)
+    return result
+
+async def used_memory(rpool):
+    """ Return used_memory of Redis, None if the server doesn't report it. """
+    try:
+        return (await rpool.info('memory')).get('used_memory')
+    except ResponseError:
+        return None
+
+async def probe(log_generator, document_visible) -> float:
+    """ Add one event and return milliseconds until its document is visible. """
+    stream_id = await log_generator.add_message(STREAM)
+    while True:
+        timestamp = await document_visible(stream_id)
+        if timestamp is not None:
+            return time.time() * 1000 - timestamp
+        await asyncio.sleep(0.001)
+
+async def benchmark(args, port: int) -> dict:
+    """ Run benchmark against Redis on port. """
+    os.environ['REDIS_HOST'] = '127.0.0.1'
+    os.environ['REDIS_PORT'] = str(port)
+    os.environ['REDIS_STREAM_NAME'] = STREAM
+    os.environ.setdefault('CAPITALS_FILE', os.path.join(ROOT, 'loggenerator', 'country-capitals.json'))
+    os.environ.setdefault('FUNCTION_LIBRARY_FILE', os.path.join(ROOT, 'streamsplitter', 'stream_splitter.lua'))
+    for service in ('loggenerator', 'streamsplitter', 'search'):
+        sys.path.insert(0, os.path.join(ROOT, service))
+    import log_generator
+    import streamsplitter
+
+    rpool = streamsplitter.rpool
+    server = await rpool.info('server') if not args.stand_in else {}
+    modules = [module['name'].lower() for module in await rpool.module_list()] if not args.stand_in else []
+    search = None
+    if 'search' in modules:
+        import search
+
+    await log_generator.populate_capitals()
+    await log_generator.init_config()
+    await rpool.xgroup_create(STREAM, streamsplitter.REDIS_CONSUMER_GROUP, mkstream=True)
+    await rpool.set("stream_splitter", 0)
+    if search:
+        # Index the current partition before documents arrive
+        partition = streamsplitter.log_partition(f"{round(time.time() * 1000)}-0")
+        await rpool.zadd(
+            streamsplitter.LOG_PARTITIONS_KEY,
+            {partition: partition + streamsplitter.LOG_PARTITION_SECONDS},
+            nx=True)
+        await search.update_partitions()
+
+    async def document_visible(stream_id: str):
+        """ Return timestamp of the document of stream_id if it's visible. """
+        key = f"{streamsplitter.LOG_PREFIX}{streamsplitter.log_partition(stream_id)}:{stream_id}"
+        if search:
+            res = await rpool.ft(search.partition_index(streamsplitter.log_partition(stream_id))).search(
+                search.Query("*").limit_ids(key).return_fields("timestamp"))
+            return float(res.docs[0].timestamp) if res.docs else None
+        timestamp = await rpool.json().get(key, '$.timestamp')
+        return float(timestamp[0]) if timestamp else None
+
+    # Ingest with the splitter stopped
+    memory_start = await used_memory(rpool)
+    generated = await log_generator.generate_messages(
+        STREAM, args.events, args.chunk_size, args.max_in_flight)
+    stream_bytes = await rpool.memory_usage(STREAM, samples=0) if not args.stand_in else None
+
+    add_count = min(args.events, 5000)
+    start = time.perf_counter()
+    for _ in range(add_count):
+        await log_generator.add_message(STREAM)
+    add_duration = time.perf_counter() - start
+    total = args.events + add_count
+
+    # Drain the backlog
+    await rpool.set("stream_splitter", 1)
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(streamsplitter.read_streams()),
+        asyncio.create_task(streamsplitter.flush_severity_counts())
+    ]
+    async def drained():
+        while streamsplitter.stats.processed < total:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(drained(), timeout=args.timeout)
+    split_duration = time.perf_counter() - start
+    await streamsplitter.severity_counter.flush()
+    memory_split = await used_memory(rpool)
+
+    # Steady load at a fixed rate with probes sampling end-to-end latency
+    async def load():
+        interval = args.chunk_size / args.rate
+        next_chunk = time.monotonic()
+        while True:
+            await log_generator.generate_messages(STREAM, args.chunk_size, args.chunk_size, 1)
+            next_chunk += interval
+            await asyncio.sleep(max(0, next_chunk - time.monotonic()))
+
+    load_task = asyncio.create_task(load())
+    probes = []
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        probes.append(asyncio.create_task(probe(log_generator, document_visible)))
+        await asyncio.sleep(args.probe_interval)
+    load_task.cancel()
+    latencies = await asyncio.wait_for(asyncio.gather(*probes), timeout=60)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for module in (log_generator, streamsplitter, search):
+        if module:
+            await module.rpool.aclose()
+
+    return {
+        **git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "server": {
+            "kind": "fakeredis" if args.stand_in else os.path.basename(args.server),
+            "version": server.get('redis_version'),
+            "modules": modules,
+            "index_visibility": bool(search)
+        },
+        "params": {
+            "events": args.events,
+            "chunk_size": args.chunk_size,
+            "max_in_flight": args.max_in_flight,
+            "rate": args.rate,
+            "duration": args.duration,
+            "probe_interval": args.probe_interval,
+            "splitter_batch_size": streamsplitter.SPLITTER_BATCH_SIZE,
+            "splitter_concurrency": streamsplitter.SPLITTER_CONCURRENCY,
+            "stream_encoding": log_generator.STREAM_ENCODING
+        },
+        "ingest": {
+            "generate_events_per_sec": generated["events_per_sec"],
+            "add_message_events_per_sec": round(add_count / add_duration)
+        },
+        "splitter": {
+            "events": total,
+            "events_per_sec": round(total / split_duration)
+        },
+        "latency_ms": percentiles(latencies),
+        "memory": {
+            "stream_bytes_per_event": round(stream_bytes / args.events, 1) if stream_bytes else None,
+            "total_bytes_per_event": (
+                round((memory_split - memory_start) / total, 1)
+                if memory_start is not None and memory_split is not None else None
+            )
+        }
+    }
+
+def run(args) -> None:
+    """ Run benchmark on a scratch server and store the results. """
+    port = free_port()
+    process = start_server(args, port)
+    try:
+        # Wait for the server to accept connections
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        result = asyncio.run(benchmark(args, port))
+    finally:
+        process.terminate()
+        process.wait()
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{result['date'].replace(':', '')}-{result['commit'][:8]}.json")
+    with open(path, 'w') as output:
+        json.dump(result, output, indent=2)
+    print(json.dumps(result, indent=2))
+    print(f"Results written to {path}")
+
+def compare(args) -> None:
+    """ Print metrics of two result files and their relative change. """
+    with open(args.old) as old_file, open(args.new) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    print(f"{'metric':<36} {old['commit'][:8]:>12} {new['commit'][:8]:>12} {'change':>8}")
+    for section, metric in METRICS:
+        before = old.get(section, {}).get(metric)
+        after = new.get(section, {}).get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0
+        better = change < 0 if section in LOWER_IS_BETTER else change > 0
+        marker = "" if abs(change) < 5 else (" +" if better else " !")
+        print(f"{section + '.' + metric:<36} {before:>12} {after:>12} {change:>7.1f}%{marker}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest path benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run benchmark on a scratch server")
+    run_parser.add_argument("--events", type=int, default=100000, help="events ingested and drained")
+    run_parser.add_argument("--chunk-size", type=int, default=1000)
+    run_parser.add_argument("--max-in-flight", type=int, default=4)
+    run_parser.add_argument("--rate", type=int, default=5000, help="events/sec during latency sampling")
+    run_parser.add_argument("--duration", type=float, default=10, help="seconds of latency sampling")
+    run_parser.add_argument("--probe-interval", type=float, default=0.01, help="seconds between probes")
+    run_parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for the splitter")
+    run_parser.add_argument("--server", default="redis-stack-server", help="redis server binary")
+    run_parser.add_argument("--module", action="append", default=[], help="module to load, repeatable")
+    run_parser.add_argument("--stand-in", action="store_true", help="use fakeredis instead of Redis")
+    run_parser.add_argument("--output", default=RESULTS_DIR)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ export default createStore({
       stream_websocket: null,
       message_keys: {},
       messages: [],
+      last_ids: {},
       redis_keys: 0,
       redis_used_memory: 0
     },
@@ -38,6 +39,9 @@ export default createStore({
       resetMessages(state) {
         state.messages = []
       },
+      setLastIDs(state, ids) {
+        Object.assign(state.last_ids, ids)
+      },
       setClientID(state, id) {
         state.client_id = id
       },
@@ -68,11 +72,22 @@ export default createStore({
       },
       checkStreamWebSocket({commit, dispatch, state}, id) {
         console.log("client_id: ", id)
+        // Receive events in batches coalesced for up to 100 ms and
+        // resume from the last seen entries when reconnecting
+        const resume = Object.entries(state.last_ids).map(([stream, last_id]) => `${stream}:${last_id}`).join(',')
+        const params = resume ? `batch_window_ms=100&resume=${encodeURIComponent(resume)}` : 'batch_window_ms=100'
         if (location.protocol !== 'https:') {
-          commit('setStreamWebSocket', new WebSocket(`ws://${window.location.host}/ws/${id}`))
+          commit('setStreamWebSocket', new WebSocket(`ws://${window.location.host}/ws/${id}?${params}`))
         }
         else {
-          commit('setStreamWebSocket', new WebSocket(`wss://${window.location.host}/ws/${id}`))
+          commit('setStreamWebSocket', new WebSocket(`wss://${window.location.host}/ws/${id}?${params}`))
+        }
+        const websocket = state.stream_websocket
+        websocket.onclose = () => {
+          // Reconnect unless replaced by a new connection
+          if (state.stream_websocket === websocket) {
+            setTimeout(() => dispatch('checkStreamWebSocket', id), 1000)
+          }
         }
         state.stream_websocket.onmessage = (event) => {
           let data = JSON.parse(event.data)
@@ -81,8 +96,24 @@ export default createStore({
               state.stream_websocket.send("pong")
               dispatch('setRedisStats', data.data.redis_info)
           }
+          else if (data.type === "messages") {
+            for (const message of data.data) {
+              commit('addMessage', message)
+            }
+            commit('setLastIDs', data.ids)
+          }
+          else if (data.type === "batching") {
+            console.log("batching: ", data.data)
+          }
+          else if (data.type === "skipped") {
+            console.log("skipped events: ", data.data.count)
+          }
+          else if (data.type === "resume") {
+            console.log("resumed: ", data.data)
+          }
           else {
             commit('addMessage', data.data)
+            commit('setLastIDs', {[data.stream]: data.id})
           }
         }
       }
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the log generator.
+
+synth: compares the per-event path (build_message + json.dumps) with
+the vectorized batch synthesizer. Doesn't need Redis.
+
+encoding: writes and reads back events with every stream entry
+encoding and reports memory per entry and events/sec. Needs Redis at
+REDIS_HOST:REDIS_PORT, no modules are used.
+
+Usage:
+    python benchmark.py synth [n] [batch_size]
+    python benchmark.py encoding [n] [batch_size]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import msgpack
+
+from log_generator import (
+    BULK_CHUNK_SIZE,
+    INITIAL_CONFIGURATION,
+    STREAM_ENCODINGS,
+    build_message,
+    capitals_table,
+    compile_config,
+    read_capitals_file,
+    rpool,
+    synthesize_entries,
+    synthesize_messages,
+    write_messages
+)
+
+def bench_per_event(hosts, n: int) -> float:
+    """ Return seconds used to build n messages one at a time. """
+    start = time.perf_counter()
+    for _ in range(n):
+        json.dumps(build_message(hosts, capitals_table.random_location()))
+    return time.perf_counter() - start
+
+def bench_batch(hosts, n: int, batch_size: int) -> float:
+    """ Return seconds used to build n messages in batches of batch_size. """
+    start = time.perf_counter()
+    for offset in range(0, n, batch_size):
+        synthesize_messages(hosts, min(batch_size, n - offset))
+    return time.perf_counter() - start
+
+def synth(hosts, n: int, batch_size: int) -> None:
+    """ Compare per-event and batch synthesis. """
+    # Sanity check: batch output must decode to the same fields.
+    sample = json.loads(synthesize_messages(hosts, 1)[0])
+    assert list(sample) == list(build_message(hosts, capitals_table.location(0)))
+
+    results = {
+        "per_event": bench_per_event(hosts, n),
+        "batch": bench_batch(hosts, n, batch_size)
+    }
+    for name, duration in results.items():
+        print(f"{name:>10}: {n} events in {duration:.3f}s, {n / duration:,.0f} events/sec")
+    print(f"{'speedup':>10}: {results['per_event'] / results['batch']:.1f}x")
+
+def decode(fields: dict) -> dict:
+    """ Decode entry like the stream splitter and websocket app do. """
+    if "json" in fields:
+        return json.loads(fields["json"])
+    if "msgpack" in fields:
+        return msgpack.unpackb(fields["msgpack"].encode('utf-8', 'surrogateescape'))
+    event = dict(fields)
+    event["timestamp"] = json.loads(event["timestamp"])
+    return event
+
+async def bench_encoding(hosts, encoding: str, n: int, batch_size: int) -> dict:
+    """ Write and read back n events with encoding. """
+    stream = f"benchmark:encoding:{encoding}"
+    await rpool.delete(stream)
+
+    start = time.perf_counter()
+    for offset in range(0, n, batch_size):
+        await write_messages(synthesize_entries(hosts, min(batch_size, n - offset), encoding), stream)
+    write_duration = time.perf_counter() - start
+
+    memory = await rpool.memory_usage(stream, samples=0)
+
+    start = time.perf_counter()
+    last_id = "-"
+    while True:
+        entries = await rpool.xrange(stream, min=last_id, count=batch_size)
+        if last_id != "-":
+            entries = entries[1:]
+        if not entries:
+            break
+        for _, fields in entries:
+            decode(fields)
+        last_id = entries[-1][0]
+    read_duration = time.perf_counter() - start
+
+    await rpool.delete(stream)
+    return {
+        "bytes_per_entry": round(memory / n, 1),
+        "write_events_per_sec": round(n / write_duration),
+        "read_decode_events_per_sec": round(n / read_duration)
+    }
+
+async def encoding(hosts, n: int, batch_size: int) -> None:
+    """ Compare stream entry encodings. """
+    # Reads back binary msgpack fields like the consumers do.
+    rpool.connection_pool.connection_kwargs["encoding_errors"] = "surrogateescape"
+    try:
+        for name in STREAM_ENCODINGS:
+            result = await bench_encoding(hosts, name, n, batch_size)
+            print(
+                f"{name:>8}: {result['bytes_per_entry']:>7} bytes/entry, "
+                f"write {result['write_events_per_sec']:,} events/sec, "
+                f"read+decode {result['read_decode_events_per_sec']:,} events/sec"
+            )
+    finally:
+        await rpool.aclose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Log generator benchmarks")
+    parser.add_argument("benchmark", choices=["synth", "encoding"])
+    parser.add_argument("n", type=int, nargs="?", default=200000)
+    parser.add_argument("batch_size", type=int, nargs="?", default=BULK_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    capitals, _ = read_capitals_file()
+    capitals_table.load(capitals)
+    hosts = compile_config(INITIAL_CONFIGURATION)
+
+    if args.benchmark == "synth":
+        synth(hosts, args.n, args.batch_size)
+    else:
+        asyncio.run(encoding(hosts, args.n, args.batch_size))
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,23 @@
 #!/usr/bin/env python
 
+import argparse
 import asyncio
+import hashlib
 import json
+import mmap
+import multiprocessing
+import os
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from os import environ
-from random import choice, choices, randint
-from typing import Optional, List
+from random import Random, choice, choices, randint, randrange
+from typing import Dict, Optional, List, Tuple
 from pydantic import BaseModel
 
+import msgpack
+import numpy as np
 import redis.asyncio as redis
 from fastapi import BackgroundTasks, FastAPI, Request
 from fastapi.responses import JSONResponse
@@ -15,6 +25,45 @@ from fastapi.responses import JSONResponse
 REDIS_HOST = environ.get('REDIS_HOST') or 'localhost'
 REDIS_PORT = int(environ.get('REDIS_PORT') or 6379)
 REDIS_STREAM_NAME = environ.get('REDIS_STREAM_NAME') or 'test'
+REDIS_STREAM_MAXLEN = int(environ.get('REDIS_STREAM_MAXLEN') or 200000)
+
+# Stream entry encoding of log events:
+# - json: single 'json' field with the serialized event
+# - fields: one field per event attribute
+# - msgpack: single 'msgpack' field with the packed event
+STREAM_ENCODINGS = ("json", "fields", "msgpack")
+STREAM_ENCODING = environ.get('STREAM_ENCODING') or 'json'
+if STREAM_ENCODING not in STREAM_ENCODINGS:
+    raise ValueError(f"STREAM_ENCODING must be one of {', '.join(STREAM_ENCODINGS)}")
+
+# Bulk generation defaults: messages per pipelined XADD chunk and
+# maximum number of pipelines awaiting a reply at the same time.
+BULK_CHUNK_SIZE = int(environ.get('BULK_CHUNK_SIZE') or 1000)
+BULK_MAX_IN_FLIGHT = int(environ.get('BULK_MAX_IN_FLIGHT') or 4)
+# Upper limit for worker processes of a single bulk generation run.
+BULK_MAX_WORKERS = int(environ.get('BULK_MAX_WORKERS') or os.cpu_count() or 1)
+
+# Rate controlled generators: shortest sleep between batches in seconds
+# and maximum number of events written in one batch.
+GENERATOR_TICK = float(environ.get('GENERATOR_TICK') or 0.005)
+GENERATOR_MAX_BATCH = int(environ.get('GENERATOR_MAX_BATCH') or 1000)
+
+# Directory for recorded NDJSON files replayable through the API and
+# bytes read from the memory map at a time.
+REPLAY_DIR = environ.get('REPLAY_DIR') or 'replay'
+REPLAY_READ_CHUNK = int(environ.get('REPLAY_READ_CHUNK') or 4 * 1024 * 1024)
+
+CONFIG_KEY = 'generator:config'
+CONFIG_VERSION_KEY = 'generator:config:version'
+# Maximum seconds a cached config snapshot is used before its version is
+# checked again. Bounds the delay for edits made through other replicas.
+CONFIG_CHECK_INTERVAL = float(environ.get('CONFIG_CHECK_INTERVAL') or 1)
+
+CAPITALS_FILE = environ.get('CAPITALS_FILE') or 'country-capitals.json'
+CAPITALS_KEY = 'capitals'
+CAPITALS_CHECKSUM_KEY = 'capitals:checksum'
+# Seconds between checks of the capitals source file and Redis copy.
+CAPITALS_REFRESH_INTERVAL = float(environ.get('CAPITALS_REFRESH_INTERVAL') or 30)
 
 rpool = redis.Redis(
     host=REDIS_HOST,
@@ -30,6 +79,15 @@ LOG_LEVELS = [
     "CRITICAL"
 ]
 
+LOG_LEVEL_WEIGHTS = [
+    0.3,
+    0.3,
+    0.2,
+    0.15,
+    0.05
+]
+LOG_LEVEL_CUM_WEIGHTS = np.cumsum(LOG_LEVEL_WEIGHTS)
+
 INITIAL_CONFIGURATION = {
     "hosts": [
         {
@@ -59,27 +117,262 @@ INITIAL_CONFIGURATION = {
     ]
 }
 
+class CapitalsTable:
+    """
+    In-memory table of capitals stored as parallel arrays.
+
+    Sampling a location is a local index pick. The table keeps the
+    checksums of the source file and of the Redis copy it was loaded
+    from so it is only rebuilt when either of them changes.
+    """
+    def __init__(self):
+        self.names: List[str] = []
+        self.coordinates: List[str] = []
+        self.country_codes: List[str] = []
+        # JSON encoded location fields for the batch synthesizer
+        self.encoded: List[str] = []
+        self.file_checksum: Optional[str] = None
+        self.redis_checksum: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def load(self, capitals: list) -> None:
+        """ Replace table contents with list of capital entries. """
+        self.names = [capital['CapitalName'] for capital in capitals]
+        self.coordinates = [
+            f"{capital['CapitalLongitude']},{capital['CapitalLatitude']}"
+            for capital in capitals
+        ]
+        self.country_codes = [capital['CountryCode'] for capital in capitals]
+        self.encoded = [
+            f'"city": {json.dumps(name)}, "coordinates": {json.dumps(coordinates)}, "country_code": {json.dumps(country_code)}'
+            for name, coordinates, country_code in zip(self.names, self.coordinates, self.country_codes)
+        ]
+
+    def location(self, idx: int) -> dict:
+        """ Return location fields for capital at idx. """
+        return {
+            'capital': self.names[idx],
+            'coordinates': self.coordinates[idx],
+            'country_code': self.country_codes[idx]
+        }
+
+    def random_location(self) -> dict:
+        """ Return location fields for random capital. """
+        return self.location(randrange(len(self.names)))
+
+capitals_table = CapitalsTable()
+
+def read_capitals_file(path: str = CAPITALS_FILE):
+    """ Return parsed capitals and checksum of the source file. """
+    with open(path, 'rb') as capitals_file:
+        data = capitals_file.read()
+    return json.loads(data), hashlib.sha1(data).hexdigest()
+
 async def populate_capitals():
-    # Populate country capitals object
-    with open('country-capitals.json', 'r') as capitals:
-        capitals = json.loads(capitals.read())
-        await rpool.json().set('capitals', '$', capitals)
+    """
+    Load capitals from source file to the in-memory table and make sure
+    the Redis copy matches it.
+    """
+    capitals, checksum = read_capitals_file()
+    if await rpool.get(CAPITALS_CHECKSUM_KEY) != checksum:
+        async with rpool.pipeline(transaction=True) as pipe:
+            pipe.json().set(CAPITALS_KEY, '$', capitals)
+            pipe.set(CAPITALS_CHECKSUM_KEY, checksum)
+            await pipe.execute()
+    capitals_table.load(capitals)
+    capitals_table.file_checksum = checksum
+    capitals_table.redis_checksum = checksum
+
+async def refresh_capitals():
+    """
+    Rebuild the capitals table if the source file or the Redis copy
+    changed since the last load. Writers of the Redis copy are expected
+    to update CAPITALS_CHECKSUM_KEY alongside it.
+    """
+    _, file_checksum = read_capitals_file()
+    if file_checksum != capitals_table.file_checksum:
+        await populate_capitals()
+        return
+
+    redis_checksum = await rpool.get(CAPITALS_CHECKSUM_KEY)
+    if redis_checksum is not None and redis_checksum != capitals_table.redis_checksum:
+        capitals = await get_capitals()
+        if capitals:
+            capitals_table.load(capitals)
+            capitals_table.redis_checksum = redis_checksum
+
+async def capitals_refresher():
+    """ Periodically check if the capitals table needs reloading. """
+    while True:
+        await asyncio.sleep(CAPITALS_REFRESH_INTERVAL)
+        try:
+            await refresh_capitals()
+        except (OSError, ValueError, redis.RedisError) as err:
+            print(f"Capitals refresh failed: {err}")
+
+@dataclass
+class RateProfile:
+    """
+    Target events/sec over time for a rate controlled generator.
+
+    Profiles:
+    - constant: rate
+    - ramp: linear from ramp_from to rate over ramp_seconds, then rate
+    - burst: rate, raised to burst_rate for burst_seconds every burst_interval seconds
+    """
+
+    rate: float
+    profile: str = "constant"
+    ramp_from: float = 0
+    ramp_seconds: float = 60
+    burst_rate: float = 0
+    burst_seconds: float = 1
+    burst_interval: float = 10
+
+    def rate_at(self, elapsed: float) -> float:
+        """ Return target rate at elapsed seconds from start. """
+        if self.profile == "ramp" and elapsed < self.ramp_seconds:
+            return self.ramp_from + (self.rate - self.ramp_from) * elapsed / self.ramp_seconds
+        if self.profile == "burst" and self.burst_interval > 0 and elapsed % self.burst_interval < self.burst_seconds:
+            return max(self.rate, self.burst_rate)
+        return self.rate
+
+    def peak_rate(self) -> float:
+        """ Return highest rate of the profile. """
+        if self.profile == "ramp":
+            return max(self.rate, self.ramp_from)
+        if self.profile == "burst":
+            return max(self.rate, self.burst_rate)
+        return self.rate
+
+class TokenBucket:
+    """ Token bucket refilled at a variable rate up to capacity tokens. """
+    def __init__(self, capacity: float):
+        self.capacity = max(1.0, capacity)
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+    def refill(self, rate: float, now: float) -> None:
+        """ Add tokens accumulated at rate since last refill. """
+        self.tokens = min(self.capacity, self.tokens + rate * (now - self.updated))
+        self.updated = now
+
+    def take(self, limit: int) -> int:
+        """ Remove up to limit whole tokens and return their number. """
+        n = min(int(self.tokens), limit)
+        self.tokens -= n
+        return n
+
+class GeneratorStats:
+    """ Throughput and latency statistics of a generator. """
+    def __init__(self, window: int = 1000, rate_window: float = 5):
+        self.started = time.monotonic()
+        self.sent = 0
+        self.expected = 0.0
+        self.rate_window = rate_window
+        self.latencies: deque = deque(maxlen=window)
+        self.recent: deque = deque()
+
+    def record(self, n: int, latency: float) -> None:
+        """ Record n events written with latency seconds. """
+        now = time.monotonic()
+        self.sent += n
+        self.latencies.append(latency)
+        self.recent.append((now, n))
+        while self.recent and self.recent[0][0] < now - self.rate_window:
+            self.recent.popleft()
+
+    def snapshot(self) -> dict:
+        """ Return statistics as dictionary. """
+        now = time.monotonic()
+        recent = sum(n for ts, n in self.recent if ts >= now - self.rate_window)
+        elapsed = min(self.rate_window, now - self.started)
+        stats = {
+            "sent": self.sent,
+            "achieved_rate": round(recent / elapsed, 1) if elapsed > 0 else 0,
+            "backlog": max(0, round(self.expected) - self.sent),
+            "xadd_latency_ms": {}
+        }
+        if self.latencies:
+            p50, p90, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 90, 99])
+            stats["xadd_latency_ms"] = {
+                "p50": round(float(p50), 3),
+                "p90": round(float(p90), 3),
+                "p99": round(float(p99), 3)
+            }
+        return stats
 
 class MessageGenerator:
-    """ Class for automated message generation. """
-    def __init__(self, enabled: bool = False, min_delay: int = 100, max_delay: int = 1000, stream: str = "test"):
+    """
+    Class for automated message generation.
+
+    Without a rate profile messages are added one at a time with a random
+    delay between min_delay and max_delay. With a rate profile events are
+    written in batches paced by a token bucket of bucket_size tokens,
+    by default 100 ms worth of events at the peak rate.
+    """
+    def __init__(
+        self,
+        enabled: bool = False,
+        min_delay: int = 100,
+        max_delay: int = 1000,
+        stream: str = "test",
+        rate: Optional[RateProfile] = None,
+        bucket_size: Optional[int] = None
+        ):
         self.enabled = enabled
+        self.generator_enabled = False
         self.min_delay = min_delay
         self.max_delay = max_delay
         self.stream = stream
+        self.rate = rate
+        self.bucket_size = bucket_size
+        self.stats = GeneratorStats()
 
     async def enable(self) -> None:
         """ Enable generator and run it until it is disabled. """
+        if self.generator_enabled:
+            return
         self.generator_enabled = True
+        self.stats = GeneratorStats()
+        if self.rate is None:
+            await self.run_random_delay()
+        else:
+            await self.run_target_rate()
+
+    async def run_random_delay(self) -> None:
+        """ Add single messages with random delay between them. """
         while self.generator_enabled:
+            start = time.perf_counter()
             await add_message(self.stream)
+            self.stats.record(1, time.perf_counter() - start)
             await asyncio.sleep(randint(self.min_delay, self.max_delay) / 1000)
 
+    async def run_target_rate(self) -> None:
+        """ Write batches of messages paced to the rate profile. """
+        started = last = time.monotonic()
+        bucket = TokenBucket(self.bucket_size or self.rate.peak_rate() / 10)
+        while self.generator_enabled:
+            now = time.monotonic()
+            rate = self.rate.rate_at(now - started)
+            bucket.refill(rate, now)
+            self.stats.expected += rate * (now - last)
+            last = now
+
+            n = bucket.take(GENERATOR_MAX_BATCH)
+            if n == 0:
+                # Re-evaluate the profile at least every 100 ms
+                wait = (1 - bucket.tokens) / rate if rate > 0 else 0.1
+                await asyncio.sleep(max(GENERATOR_TICK, min(wait, 0.1)))
+                continue
+
+            entries = synthesize_entries(await config_cache.get(), n)
+            start = time.perf_counter()
+            await write_messages(entries, self.stream)
+            self.stats.record(n, time.perf_counter() - start)
+
     def disable(self) -> None:
         """ Disable generator. """
         self.generator_enabled = False
@@ -92,66 +385,505 @@ class MessageGenerator:
         """ Set maximum delay in milliseconds. """
         self.max_delay = max_delay
 
+    def info(self) -> dict:
+        """ Return generator settings, state and statistics. """
+        return {
+            "stream": self.stream,
+            "running": self.generator_enabled,
+            "rate": vars(self.rate) if self.rate else None,
+            "bucket_size": self.bucket_size,
+            "stats": self.stats.snapshot()
+        }
+
 message_generator = MessageGenerator(stream=REDIS_STREAM_NAME)
 
+# Named generators, the default one is controlled by enable/disable routes.
+generators: Dict[str, MessageGenerator] = {"default": message_generator}
+
 async def init_config():
     """ Init configuration for generator. """
-    ret = await rpool.json().set("generator:config", "$", INITIAL_CONFIGURATION)
+    async with rpool.pipeline(transaction=True) as pipe:
+        pipe.json().set(CONFIG_KEY, "$", INITIAL_CONFIGURATION)
+        ret, _ = await commit_config_change(pipe)
     return ret
 
 async def get_config():
     """ Retrieve full configuration. """
-    config = await rpool.json().get("generator:config")
+    config = await rpool.json().get(CONFIG_KEY)
     return config
 
-async def get_random_capital_with_coordinates():
+async def commit_config_change(pipe) -> list:
+    """
+    Bump config version as part of pipe, execute it and invalidate the
+    local config snapshot. Returns pipeline results.
+    """
+    pipe.incr(CONFIG_VERSION_KEY)
+    res = await pipe.execute()
+    config_cache.invalidate()
+    return res
+
+@dataclass
+class CompiledHost:
+    """ Enabled host configuration prepared for message generation. """
+
+    hostname_parts: Tuple[str, ...]
+    amount: int
+    messages: List[str]
+    encoded_hostname_parts: Tuple[str, ...] = field(init=False)
+    encoded_messages: List[str] = field(init=False)
+
+    def __post_init__(self):
+        # JSON string contents for the batch synthesizer
+        self.encoded_hostname_parts = tuple(json.dumps(part)[1:-1] for part in self.hostname_parts)
+        self.encoded_messages = [json.dumps(message) for message in self.messages]
+
+    def hostname(self) -> str:
+        """ Return hostname with RANDINT replaced by 1..amount. """
+        if len(self.hostname_parts) == 1:
+            return self.hostname_parts[0]
+        return str(randint(1, self.amount)).join(self.hostname_parts)
+
+def compile_config(config: dict) -> List[CompiledHost]:
+    """ Compile enabled hosts of configuration. """
+    return [
+        CompiledHost(
+            hostname_parts=tuple(host["options"]["hostname"].split('RANDINT')),
+            amount=int(host["options"]["amount"]),
+            messages=list(host["messages"])
+        )
+        for host in config["hosts"] if host["options"]["enabled"]
+    ]
+
+class ConfigCache:
+    """
+    Compiled snapshot of generator configuration.
+
+    The snapshot is rebuilt when the config version in Redis changes.
+    Local changes invalidate it immediately, changes made through other
+    replicas are noticed within check_interval seconds.
+    """
+    def __init__(self, check_interval: float = CONFIG_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.hosts: List[CompiledHost] = []
+        self.version: Optional[str] = None
+        self.checked_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        """ Force reload on next access. """
+        self.checked_at = None
+
+    async def get(self) -> List[CompiledHost]:
+        """ Return compiled enabled hosts. """
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return self.hosts
+
+        version = await rpool.get(CONFIG_VERSION_KEY)
+        if self.checked_at is None or version != self.version:
+            async with rpool.pipeline(transaction=True) as pipe:
+                pipe.get(CONFIG_VERSION_KEY)
+                pipe.json().get(CONFIG_KEY)
+                version, config = await pipe.execute()
+            self.hosts = compile_config(config)
+            self.version = version
+        self.checked_at = now
+        return self.hosts
+
+config_cache = ConfigCache()
+
+async def get_capitals():
+    """ Retrieve all capitals from Redis copy. """
+    capitals = await rpool.json().get(CAPITALS_KEY)
+    return capitals
+
+def get_random_capital_with_coordinates():
     """ Return random capital city with coordinates. """
-    numcapitals = await rpool.json().arrlen('capitals')
-    capital = await rpool.json().get('capitals', f'.[{randint(0, numcapitals-1)}]')
-    return {
-        'capital': capital['CapitalName'],
-        'coordinates': f"{capital['CapitalLongitude']},{capital['CapitalLatitude']}",
-        'country_code': capital['CountryCode']
-    }
-    
-async def random_message():
-    """ Generate random message. """
-    config = await get_config()
-    hostconfig = choice([host for host in filter(lambda x: x["options"]["enabled"], config["hosts"])])
-    hostname = hostconfig["options"]["hostname"].replace('RANDINT', str(randint(1, int(hostconfig["options"]["amount"]))))
+    return capitals_table.random_location()
+
+def build_message(hosts: List[CompiledHost], location: dict) -> dict:
+    """ Build log message from compiled host configurations and location. """
+    host = choice(hosts)
 
     message = {}
     message['timestamp'] = round(time.time() * 1000)
-    message['hostname'] = hostname
+    message['hostname'] = host.hostname()
     message['log_level'] = choices(
         population=LOG_LEVELS,
-        weights=[
-            0.3,
-            0.3,
-            0.2,
-            0.15,
-            0.05
-        ],
+        weights=LOG_LEVEL_WEIGHTS,
         k=1
     )[0]
-    message["message"] = choice(hostconfig["messages"])
-    location = await get_random_capital_with_coordinates()
+    message["message"] = choice(host.messages)
     message["city"] = location['capital']
     message["coordinates"] = location['coordinates']
     message['country_code'] = location['country_code']
     return message
 
+def draw_batch(hosts: List[CompiledHost], n: int, rng: np.random.Generator):
+    """
+    Draw host, host number, message, log level and capital indices for n
+    events as NumPy arrays. Returns them as lists.
+    """
+    amounts = np.array([host.amount for host in hosts])
+    message_counts = np.array([len(host.messages) for host in hosts])
+
+    host_idx = rng.integers(0, len(hosts), size=n)
+    host_numbers = rng.integers(1, amounts[host_idx], endpoint=True)
+    message_idx = (rng.random(n) * message_counts[host_idx]).astype(np.int64)
+    level_idx = np.searchsorted(LOG_LEVEL_CUM_WEIGHTS, rng.random(n) * LOG_LEVEL_CUM_WEIGHTS[-1], side='right')
+    capital_idx = rng.integers(0, len(capitals_table), size=n)
+    return (
+        host_idx.tolist(),
+        host_numbers.tolist(),
+        message_idx.tolist(),
+        level_idx.tolist(),
+        capital_idx.tolist()
+    )
+
+def synthesize_messages(hosts: List[CompiledHost], n: int, rng: Optional[np.random.Generator] = None) -> List[str]:
+    """
+    Build n JSON encoded log messages at once.
+
+    Host, host number, log level, message and capital indices for the
+    whole batch are drawn as NumPy arrays and the payloads are assembled
+    from pre-encoded JSON fragments in a single pass. The output is the
+    same as json.dumps(build_message(...)) for each event.
+    """
+    timestamp = round(time.time() * 1000)
+    locations = capitals_table.encoded
+    return [
+        f'{{"timestamp": {timestamp}, '
+        f'"hostname": "{str(number).join(hosts[h].encoded_hostname_parts)}", '
+        f'"log_level": "{LOG_LEVELS[level]}", '
+        f'"message": {hosts[h].encoded_messages[m]}, '
+        f'{locations[c]}}}'
+        for h, number, m, level, c in zip(*draw_batch(hosts, n, rng or np.random.default_rng()))
+    ]
+
+def synthesize_events(hosts: List[CompiledHost], n: int, rng: Optional[np.random.Generator] = None) -> List[dict]:
+    """ Build n log message dictionaries at once. """
+    timestamp = round(time.time() * 1000)
+    table = capitals_table
+    return [
+        {
+            'timestamp': timestamp,
+            'hostname': str(number).join(hosts[h].hostname_parts),
+            'log_level': LOG_LEVELS[level],
+            'message': hosts[h].messages[m],
+            'city': table.names[c],
+            'coordinates': table.coordinates[c],
+            'country_code': table.country_codes[c]
+        }
+        for h, number, m, level, c in zip(*draw_batch(hosts, n, rng or np.random.default_rng()))
+    ]
+
+def encode_entry(event: dict, encoding: str = STREAM_ENCODING) -> dict:
+    """
+    Return stream entry fields for event. With fields encoding values
+    other than strings and numbers are stored as JSON.
+    """
+    if encoding == "fields":
+        return {
+            key: value if isinstance(value, (str, int, float)) and not isinstance(value, bool) else json.dumps(value)
+            for key, value in event.items()
+        }
+    if encoding == "msgpack":
+        return {"msgpack": msgpack.packb(event)}
+    return {"json": json.dumps(event)}
+
+def synthesize_entries(hosts: List[CompiledHost], n: int, encoding: str = STREAM_ENCODING, rng: Optional[np.random.Generator] = None) -> List[dict]:
+    """ Build stream entry fields for n log messages at once. """
+    if encoding == "json":
+        return [{"json": message} for message in synthesize_messages(hosts, n, rng)]
+    return [encode_entry(event, encoding) for event in synthesize_events(hosts, n, rng)]
+
+async def random_message():
+    """ Generate random message. """
+    hosts = await config_cache.get()
+    location = get_random_capital_with_coordinates()
+    return build_message(hosts, location)
+
 async def add_message(stream="test"):
     """ Add log message to Redis stream. """
-    message = json.dumps(await random_message())
     ret = await rpool.xadd(
         name=stream,
-        fields={"json": message},
-        maxlen=200000,
+        fields=encode_entry(await random_message()),
+        maxlen=REDIS_STREAM_MAXLEN,
         approximate=True
     )
     return ret
 
+async def write_messages(entries: List[dict], stream: str = "test") -> list:
+    """ Write stream entries to Redis stream with a single pipelined round trip. """
+    async with rpool.pipeline(transaction=False) as pipe:
+        for fields in entries:
+            pipe.xadd(
+                name=stream,
+                fields=fields,
+                maxlen=REDIS_STREAM_MAXLEN,
+                approximate=True
+            )
+        return await pipe.execute()
+
+async def generate_messages(
+    stream: str = REDIS_STREAM_NAME,
+    n: int = 100,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    max_in_flight: int = BULK_MAX_IN_FLIGHT
+    ) -> dict:
+    """
+    Generate n messages to stream in chunks of chunk_size.
+
+    Configuration is read once per run. Every chunk is synthesized as a
+    batch and written as one pipeline and at most max_in_flight pipelines are
+    awaiting a reply at once.
+
+    Returns throughput report of the run.
+    """
+    chunk_size = max(1, chunk_size)
+    in_flight = asyncio.Semaphore(max(1, max_in_flight))
+
+    start = time.perf_counter()
+    hosts = await config_cache.get()
+
+    async def flush(chunk):
+        try:
+            await write_messages(chunk, stream)
+        finally:
+            in_flight.release()
+
+    tasks = []
+    for offset in range(0, n, chunk_size):
+        chunk = synthesize_entries(hosts, min(chunk_size, n - offset))
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(flush(chunk)))
+    await asyncio.gather(*tasks)
+    duration = time.perf_counter() - start
+
+    return {
+        "generated": n,
+        "chunk_size": chunk_size,
+        "max_in_flight": max_in_flight,
+        "duration": round(duration, 3),
+        "events_per_sec": round(n / duration) if duration > 0 else 0
+    }
+
+async def run_worker(stream: str, n: int, chunk_size: int, max_in_flight: int) -> dict:
+    """ Generate messages in a worker process with its own Redis connection. """
+    global rpool
+    rpool = redis.Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        decode_responses=True
+    )
+    try:
+        capitals, checksum = read_capitals_file()
+        capitals_table.load(capitals)
+        capitals_table.file_checksum = checksum
+        return await generate_messages(stream, n, chunk_size, max_in_flight)
+    finally:
+        await rpool.aclose()
+
+def generate_worker(stream: str, n: int, chunk_size: int, max_in_flight: int) -> dict:
+    """ Process pool entry point for generating a share of messages. """
+    return asyncio.run(run_worker(stream, n, chunk_size, max_in_flight))
+
+async def generate_messages_parallel(
+    stream: str = REDIS_STREAM_NAME,
+    n: int = 100,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    max_in_flight: int = BULK_MAX_IN_FLIGHT,
+    workers: int = 1
+    ) -> dict:
+    """
+    Generate n messages to stream split across worker processes.
+
+    Every worker generates a disjoint share of n with its own event loop
+    and Redis connection. Returns aggregated throughput report, duration
+    is wall clock time including worker startup.
+    """
+    workers = max(1, min(workers, BULK_MAX_WORKERS, n or 1))
+    if workers == 1:
+        report = await generate_messages(stream, n, chunk_size, max_in_flight)
+        return {**report, "workers": 1}
+
+    shares = [n // workers + (1 if i < n % workers else 0) for i in range(workers)]
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # Spawned workers don't inherit the parent's event loop or sockets.
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        reports = await asyncio.gather(*[
+            loop.run_in_executor(pool, generate_worker, stream, share, chunk_size, max_in_flight)
+            for share in shares
+        ])
+    finally:
+        pool.shutdown(wait=False)
+    duration = time.perf_counter() - start
+
+    generated = sum(report["generated"] for report in reports)
+    return {
+        "generated": generated,
+        "chunk_size": chunk_size,
+        "max_in_flight": max_in_flight,
+        "workers": workers,
+        "duration": round(duration, 3),
+        "events_per_sec": round(generated / duration) if duration > 0 else 0,
+        "worker_reports": reports
+    }
+
+def iter_ndjson_lines(path: str, chunk_size: int = REPLAY_READ_CHUNK):
+    """
+    Yield non-empty lines of NDJSON file. The file is memory-mapped and
+    split chunk_size bytes at a time so it is never loaded as a whole.
+    """
+    with open(path, 'rb') as ndjson_file:
+        size = os.fstat(ndjson_file.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(ndjson_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            remainder = b''
+            for offset in range(0, size, chunk_size):
+                lines = (remainder + mm[offset:offset + chunk_size]).split(b'\n')
+                remainder = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        yield line
+            if remainder.strip():
+                yield remainder
+
+class LogReplay:
+    """
+    Replay recorded NDJSON log events to a stream.
+
+    Events are paced by their original timestamps divided by speed,
+    speed 0 writes as fast as possible. Without seed timestamps are
+    rewritten to the time of replay. With seed the original timestamps
+    are kept and missing log_level or location fields are filled from a
+    generator seeded with it, so every run writes the same events.
+    """
+    def __init__(
+        self,
+        path: str,
+        stream: str = "test",
+        speed: float = 1.0,
+        batch_size: int = BULK_CHUNK_SIZE,
+        seed: Optional[int] = None,
+        limit: Optional[int] = None
+        ):
+        self.path = path
+        self.stream = stream
+        self.speed = speed
+        self.batch_size = max(1, batch_size)
+        self.seed = seed
+        self.limit = limit
+        self.generator_enabled = False
+        self.stats = GeneratorStats()
+
+    def prepare(self, line: bytes, event: dict, rng: Random) -> dict:
+        """ Return stream entry for event, unchanged JSON line if possible. """
+        modified = False
+        if self.seed is None:
+            event['timestamp'] = round(time.time() * 1000)
+            modified = True
+        if 'log_level' not in event:
+            event['log_level'] = rng.choices(LOG_LEVELS, weights=LOG_LEVEL_WEIGHTS, k=1)[0]
+            modified = True
+        if 'city' not in event or 'coordinates' not in event or 'country_code' not in event:
+            location = capitals_table.location(rng.randrange(len(capitals_table)))
+            event.setdefault('city', location['capital'])
+            event.setdefault('coordinates', location['coordinates'])
+            event.setdefault('country_code', location['country_code'])
+            modified = True
+        if STREAM_ENCODING == "json" and not modified:
+            return {"json": line.decode()}
+        return encode_entry(event)
+
+    async def flush(self, batch: List[dict]) -> None:
+        """ Write batch to stream and record statistics. """
+        if not batch:
+            return
+        start = time.perf_counter()
+        await write_messages(batch, self.stream)
+        self.stats.record(len(batch), time.perf_counter() - start)
+        batch.clear()
+
+    async def enable(self) -> dict:
+        """ Replay file until it ends or replay is disabled. Returns report. """
+        if self.generator_enabled:
+            return self.info()
+        self.generator_enabled = True
+        self.stats = GeneratorStats()
+        rng = Random(self.seed)
+        replay_start = time.monotonic()
+        first_timestamp = None
+        batch = []
+        skipped = 0
+        try:
+            for line in iter_ndjson_lines(self.path):
+                if not self.generator_enabled:
+                    break
+                if self.limit is not None and self.stats.sent + len(batch) >= self.limit:
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(event, dict):
+                    skipped += 1
+                    continue
+
+                timestamp = event.get('timestamp')
+                if self.speed > 0 and isinstance(timestamp, (int, float)):
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+                    due = replay_start + (timestamp - first_timestamp) / 1000 / self.speed
+                    # Events due within one tick are batched with earlier ones
+                    if due - time.monotonic() > GENERATOR_TICK:
+                        await self.flush(batch)
+                        delay = due - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+
+                batch.append(self.prepare(line, event, rng))
+                if len(batch) >= self.batch_size:
+                    await self.flush(batch)
+            await self.flush(batch)
+        finally:
+            self.generator_enabled = False
+
+        duration = time.monotonic() - replay_start
+        return {
+            "replayed": self.stats.sent,
+            "skipped": skipped,
+            "duration": round(duration, 3),
+            "events_per_sec": round(self.stats.sent / duration) if duration > 0 else 0
+        }
+
+    def disable(self) -> None:
+        """ Stop replay. """
+        self.generator_enabled = False
+
+    def info(self) -> dict:
+        """ Return replay settings, state and statistics. """
+        return {
+            "stream": self.stream,
+            "running": self.generator_enabled,
+            "replay": {
+                "path": self.path,
+                "speed": self.speed,
+                "batch_size": self.batch_size,
+                "seed": self.seed,
+                "limit": self.limit
+            },
+            "stats": self.stats.snapshot()
+        }
+
 ### FastAPI
 
 app = FastAPI()
@@ -161,6 +893,7 @@ async def startup_event():
     """ Initialize config on startup. """
     await populate_capitals()
     await init_config()
+    asyncio.create_task(capitals_refresher())
 
 @app.get("/api/generator/enable", response_class=JSONResponse)
 async def enable_generator(background_tasks: BackgroundTasks):
@@ -171,22 +904,121 @@ async def enable_generator(background_tasks: BackgroundTasks):
 @app.get("/api/generator/disable", response_class=JSONResponse)
 async def disable_generator():
     """ Disable all generators. """
-    message_generator.disable()
+    for generator in generators.values():
+        generator.disable()
     return {"success": True}
 
-@app.get("/api/generator/generate/{n}", response_class=JSONResponse)
-async def generate(request: Request, n: int):
-    """ Call log generator to generate n log messages to stream. """
-    await generate_messages(n=n, stream=REDIS_STREAM_NAME)
-    return f"Generated {n} log entries"
+class GeneratorSettings(BaseModel):
+    """
+    Named generator payload. Without rate messages are added with random
+    delay between min_delay and max_delay milliseconds.
+    """
+    stream: str = REDIS_STREAM_NAME
+    rate: Optional[float] = None
+    profile: str = "constant"
+    bucket_size: Optional[int] = None
+    ramp_from: float = 0
+    ramp_seconds: float = 60
+    burst_rate: float = 0
+    burst_seconds: float = 1
+    burst_interval: float = 10
+    min_delay: int = 100
+    max_delay: int = 1000
 
-async def generate_messages(
-    stream: str = REDIS_STREAM_NAME,
-    n: int = 100
+@app.get("/api/generator/generators", response_class=JSONResponse)
+async def list_generators():
+    """ Get settings and statistics of all named generators. """
+    return JSONResponse(content={
+        name: generator.info() for name, generator in generators.items()
+    })
+
+@app.post("/api/generator/generators/{name}/start", response_class=JSONResponse)
+async def start_named_generator(name: str, settings: GeneratorSettings, background_tasks: BackgroundTasks):
+    """ Create or replace named generator and start it. """
+    if settings.profile not in ("constant", "ramp", "burst"):
+        return JSONResponse(content={"response": "error", "error": f"Unknown profile {settings.profile}"}, status_code=400)
+
+    if name in generators:
+        generators[name].disable()
+    rate = None
+    if settings.rate is not None:
+        rate = RateProfile(
+            rate=settings.rate,
+            profile=settings.profile,
+            ramp_from=settings.ramp_from,
+            ramp_seconds=settings.ramp_seconds,
+            burst_rate=settings.burst_rate,
+            burst_seconds=settings.burst_seconds,
+            burst_interval=settings.burst_interval
+        )
+    generators[name] = MessageGenerator(
+        min_delay=settings.min_delay,
+        max_delay=settings.max_delay,
+        stream=settings.stream,
+        rate=rate,
+        bucket_size=settings.bucket_size
+    )
+    if name == "default":
+        global message_generator
+        message_generator = generators[name]
+    background_tasks.add_task(generators[name].enable)
+    return JSONResponse(content={"response": "ok"})
+
+@app.get("/api/generator/generators/{name}/stop", response_class=JSONResponse)
+async def stop_named_generator(name: str):
+    """ Stop named generator. """
+    if name not in generators:
+        return JSONResponse(content={"response": "error", "error": f"No generator {name}"}, status_code=404)
+    generators[name].disable()
+    return JSONResponse(content={"response": "ok"})
+
+class ReplayQuery(BaseModel):
+    """ Replay payload. File is relative to REPLAY_DIR. """
+    file: str
+    stream: str = REDIS_STREAM_NAME
+    speed: float = 1.0
+    batch_size: int = BULK_CHUNK_SIZE
+    seed: Optional[int] = None
+    limit: Optional[int] = None
+
+@app.post("/api/generator/replay/{name}", response_class=JSONResponse)
+async def start_replay(name: str, query: ReplayQuery, background_tasks: BackgroundTasks):
+    """ Replay recorded NDJSON file as named generator. """
+    replay_dir = os.path.realpath(REPLAY_DIR)
+    path = os.path.realpath(os.path.join(replay_dir, query.file))
+    if os.path.commonpath([replay_dir, path]) != replay_dir or not os.path.isfile(path):
+        return JSONResponse(content={"response": "error", "error": f"No replay file {query.file}"}, status_code=404)
+
+    if name in generators:
+        generators[name].disable()
+    generators[name] = LogReplay(
+        path=path,
+        stream=query.stream,
+        speed=query.speed,
+        batch_size=query.batch_size,
+        seed=query.seed,
+        limit=query.limit
+    )
+    background_tasks.add_task(generators[name].enable)
+    return JSONResponse(content={"response": "ok"})
+
+@app.get("/api/generator/generate/{n}", response_class=JSONResponse)
+async def generate(
+    request: Request,
+    n: int,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    max_in_flight: int = BULK_MAX_IN_FLIGHT,
+    workers: int = 1
     ):
-    """ Call log generator to generate n messages to stream. """
-    for _ in range(n):
-        await add_message(stream)
+    """ Call log generator to generate n log messages to stream. """
+    report = await generate_messages_parallel(
+        stream=REDIS_STREAM_NAME,
+        n=n,
+        chunk_size=chunk_size,
+        max_in_flight=max_in_flight,
+        workers=workers
+    )
+    return JSONResponse(content={"response": "ok", **report})
 
 
 @app.get("/api/generator/config", response_class=JSONResponse)
@@ -203,7 +1035,9 @@ class GeneratorMessageAdd(BaseModel):
 @app.post("/api/generator/message/add", response_class=JSONResponse)
 async def generator_message_add(query: GeneratorMessageAdd):
     """ Add message for host. """
-    ret = await rpool.json().arrappend("generator:config", f"$.hosts[{query.hostidx}].messages", query.message)
+    async with rpool.pipeline(transaction=True) as pipe:
+        pipe.json().arrappend(CONFIG_KEY, f"$.hosts[{query.hostidx}].messages", query.message)
+        ret, _ = await commit_config_change(pipe)
     return JSONResponse(ret)
 
 class GeneratorMessageDelete(BaseModel):
@@ -214,7 +1048,9 @@ class GeneratorMessageDelete(BaseModel):
 @app.post("/api/generator/message/delete", response_class=JSONResponse)
 async def generator_message_delete(query: GeneratorMessageDelete):
     """ Delete message from host. """
-    ret = await rpool.json().arrpop("generator:config", f"$.hosts[{query.hostidx}].messages", query.msgidx)
+    async with rpool.pipeline(transaction=True) as pipe:
+        pipe.json().arrpop(CONFIG_KEY, f"$.hosts[{query.hostidx}].messages", query.msgidx)
+        ret, _ = await commit_config_change(pipe)
     return JSONResponse(ret)
 
 class GeneratorMessageModify(BaseModel):
@@ -226,7 +1062,9 @@ class GeneratorMessageModify(BaseModel):
 @app.post("/api/generator/message/modify", response_class=JSONResponse)
 async def generator_message_modify(query: GeneratorMessageModify):
     """ Modify message on host. """
-    ret = await rpool.json().set("generator:config", f"$.hosts[{query.hostidx}].messages[{query.msgidx}]", query.message)
+    async with rpool.pipeline(transaction=True) as pipe:
+        pipe.json().set(CONFIG_KEY, f"$.hosts[{query.hostidx}].messages[{query.msgidx}]", query.message)
+        ret, _ = await commit_config_change(pipe)
     return JSONResponse(ret)
 
 class GeneratorConfig(BaseModel):
@@ -236,7 +1074,9 @@ class GeneratorConfig(BaseModel):
 @app.post("/api/generator/config/update", response_class=JSONResponse)
 async def generator_config_write(query: GeneratorConfig):
     """ Replace configuration. """
-    ret = await rpool.json().set("generator:config", "$.hosts", query.config)
+    async with rpool.pipeline(transaction=True) as pipe:
+        pipe.json().set(CONFIG_KEY, "$.hosts", query.config)
+        ret, _ = await commit_config_change(pipe)
     return JSONResponse(ret)
 
 class GeneratorHostOptions(BaseModel):
@@ -254,11 +1094,66 @@ class GeneratorHostAdd(BaseModel):
 @app.post("/api/generator/host/add", response_class=JSONResponse)
 async def generator_host_add(query: GeneratorHostAdd):
     """ Add host to generator configuration. """
-    ret = await rpool.json().arrappend("generator:config", f"$.hosts", query.dict())
+    async with rpool.pipeline(transaction=True) as pipe:
+        pipe.json().arrappend(CONFIG_KEY, "$.hosts", query.dict())
+        ret, _ = await commit_config_change(pipe)
     return JSONResponse(ret)
 
+async def cli_generate(args) -> dict:
+    """ Prepare capitals and config and run bulk generation. """
+    await populate_capitals()
+    if await get_config() is None:
+        await init_config()
+    try:
+        return await generate_messages_parallel(
+            stream=args.stream,
+            n=args.n,
+            chunk_size=args.chunk_size,
+            max_in_flight=args.max_in_flight,
+            workers=args.workers
+        )
+    finally:
+        await rpool.aclose()
+
+async def cli_replay(args) -> dict:
+    """ Prepare capitals and replay file. """
+    await populate_capitals()
+    try:
+        return await LogReplay(
+            path=args.file,
+            stream=args.stream,
+            speed=args.speed,
+            batch_size=args.batch_size,
+            seed=args.seed,
+            limit=args.limit
+        ).enable()
+    finally:
+        await rpool.aclose()
+
 def main():
-    pass
+    parser = argparse.ArgumentParser(description="Redis streams log generator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Generate n messages to stream")
+    generate_parser.add_argument("n", type=int)
+    generate_parser.add_argument("--stream", default=REDIS_STREAM_NAME)
+    generate_parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    generate_parser.add_argument("--max-in-flight", type=int, default=BULK_MAX_IN_FLIGHT)
+    generate_parser.add_argument("--workers", type=int, default=1)
+
+    replay_parser = subparsers.add_parser("replay", help="Replay recorded NDJSON file to stream")
+    replay_parser.add_argument("file")
+    replay_parser.add_argument("--stream", default=REDIS_STREAM_NAME)
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="0 replays as fast as possible")
+    replay_parser.add_argument("--batch-size", type=int, default=BULK_CHUNK_SIZE)
+    replay_parser.add_argument("--seed", type=int, default=None, help="Deterministic replay")
+    replay_parser.add_argument("--limit", type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        print(json.dumps(asyncio.run(cli_generate(args)), indent=2))
+    elif args.command == "replay":
+        print(json.dumps(asyncio.run(cli_replay(args)), indent=2))
 
 if __name__ == '__main__':
     main()
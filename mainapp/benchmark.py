@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Benchmark for websocket delivery.
+
+fanout: delivers n stream entries to a number of clients and reports
+CPU time per delivered event for the legacy path, which decodes every
+entry and serializes it again for every client with send_json, and for
+the raw path, which wraps the JSON text of the entry in a frame once and
+sends the same frame to every client. Websockets are stubbed out, so no
+Redis or network is needed and only the CPU spent on events is measured.
+
+Usage:
+    python benchmark.py fanout [n] [--clients 1 10 100] [--batch-window-ms 0]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from websocket import (
+    ConnectionManager,
+    WebsocketClientConnection,
+    decode_event,
+    encode_event
+)
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+class NullWebSocket:
+    """ WebSocket stub discarding frames, send_json serializes like Starlette. """
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+
+    async def send_json(self, data: dict) -> None:
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+def entries(n: int) -> list:
+    """ Return n stream entries like the log generator writes them. """
+    return [{"json": json.dumps({
+        "timestamp": round(time.time() * 1000),
+        "hostname": f"webserver-{i % 20}.example.com",
+        "log_level": LOG_LEVELS[i % len(LOG_LEVELS)],
+        "message": "1.2.3.4 requested / status 200",
+        "city": "Helsinki",
+        "coordinates": "24.933333,60.166667",
+        "country_code": "FI"
+    })} for i in range(n)]
+
+async def legacy(payloads: list, websockets: list) -> None:
+    """ Decode every entry and send it with send_json to every client. """
+    for payload in payloads:
+        event = decode_event(payload)
+        for websocket in websockets:
+            await websocket.send_json({'type': 'message', 'data': event})
+
+async def raw(payloads: list, websockets: list, batch_window_ms: int) -> None:
+    """ Deliver entries through ConnectionManager and wait for the writers. """
+    manager = ConnectionManager()
+    for client_id, websocket in enumerate(websockets):
+        connection = WebsocketClientConnection(
+            websocket=websocket,
+            streams={"benchmark"},
+            batch_window=batch_window_ms / 1000,
+            queue_size=len(payloads))
+        manager.active_connections[client_id] = connection
+        connection.writer_task = asyncio.create_task(manager.write(client_id, connection))
+    manager.deliver(
+        "benchmark",
+        [(f"{i}-0", encode_event(payload)) for i, payload in enumerate(payloads)],
+        manager.subscribers("benchmark"))
+    for client_id in list(manager.active_connections):
+        manager.flush(client_id)
+    while any(connection.queue for connection in manager.active_connections.values()):
+        await asyncio.sleep(0)
+    for client_id, connection in list(manager.active_connections.items()):
+        manager.disconnect(client_id, connection)
+
+async def fanout(n: int, levels: list, batch_window_ms: int) -> None:
+    """ Compare CPU per delivered event of legacy and raw paths. """
+    payloads = entries(n)
+    for clients in levels:
+        for path in ("legacy", "raw"):
+            websockets = [NullWebSocket() for _ in range(clients)]
+            start = time.process_time()
+            if path == "legacy":
+                await legacy(payloads, websockets)
+            else:
+                await raw(payloads, websockets, batch_window_ms)
+            duration = time.process_time() - start
+            frames = sum(websocket.frames for websocket in websockets)
+            print(
+                f"{clients:>4} clients {path:>6}: {duration / (n * clients) * 1e6:>6.2f} "
+                f"us CPU/event, {frames} frames"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Websocket delivery benchmarks")
+    parser.add_argument("benchmark", choices=["fanout"])
+    parser.add_argument("n", type=int, nargs="?", default=10000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--batch-window-ms", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(fanout(args.n, args.clients, args.batch_window_ms))
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,18 @@
 import asyncio
 import json
-from dataclasses import dataclass
-from os import environ
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from os import environ, getpid
+from socket import gethostname
 from time import time
 from pydantic import BaseModel
 
+import msgpack
+import orjson
 import redis.asyncio
 import redis.exceptions
 
-from fastapi import FastAPI, Request, WebSocket
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from redis import ResponseError
 from websockets.exceptions import ConnectionClosedOK, ConnectionClosedError
@@ -18,35 +22,370 @@ REDIS_PORT = int(environ.get('REDIS_PORT') or '6379')
 REDIS_CONSUMER_GROUP = environ.get('REDIS_CONSUMER_GROUP') or 'testgroup'
 REDIS_STREAM_NAME = environ.get('REDIS_STREAM_NAME') or 'test'
 
+# Stream splitter engines: split in the streamsplitter service or inside
+# Redis with the streamsplitter's Redis Functions library.
+SPLITTER_ENGINES = ("python", "functions")
+
+# Every subscribed stream has one shared reader broadcasting its entries
+# to all subscribers. Entries read per XREAD and milliseconds to block.
+WS_READ_BATCH = int(environ.get('WS_READ_BATCH') or 100)
+WS_READ_BLOCK_MS = int(environ.get('WS_READ_BLOCK_MS') or 1000)
+# Seconds between keepalive pings to clients.
+WS_KEEPALIVE_INTERVAL = float(environ.get('WS_KEEPALIVE_INTERVAL') or 5)
+# Clients can ask for batched delivery when connecting:
+# /ws/{client_id}?batch_window_ms=100&batch_max=200. Events are coalesced
+# for up to batch_window_ms or until batch_max of them are waiting and
+# sent as one {'type': 'messages', 'data': [...]} frame. Requests are
+# capped to WS_BATCH_WINDOW_MAX_MS and WS_BATCH_MAX. Without a window
+# every event is sent as its own 'message' frame.
+WS_BATCH_WINDOW_MAX_MS = int(environ.get('WS_BATCH_WINDOW_MAX_MS') or 1000)
+WS_BATCH_MAX = int(environ.get('WS_BATCH_MAX') or 500)
+
+# Redis INFO sections sampled every INFO_SAMPLE_INTERVAL seconds and
+# shared by keepalive pings and /api/redis/info. The frontend shows
+# db0.keys from keyspace and used_memory_human from memory.
+INFO_SECTIONS = (environ.get('INFO_SECTIONS') or 'memory,keyspace,clients,stats').split(',')
+INFO_SAMPLE_INTERVAL = float(environ.get('INFO_SAMPLE_INTERVAL') or 5)
+
+# Frames to a client are queued and sent by a writer task of its own, so
+# a slow client doesn't hold up the readers or other clients. When
+# WS_SEND_QUEUE_SIZE frames are waiting the overflow policy applies:
+# - drop_oldest: drop the oldest frame
+# - skip_marker: drop the oldest frame and tell the client how many
+#   events were skipped with a {'type': 'skipped'} frame
+# - disconnect: close the connection
+# Clients can choose the policy when connecting with ?overflow=.
+WS_SEND_QUEUE_SIZE = int(environ.get('WS_SEND_QUEUE_SIZE') or 1000)
+WS_OVERFLOW_POLICIES = ("drop_oldest", "skip_marker", "disconnect")
+WS_OVERFLOW_POLICY = environ.get('WS_OVERFLOW_POLICY') or 'drop_oldest'
+if WS_OVERFLOW_POLICY not in WS_OVERFLOW_POLICIES:
+    raise ValueError(f"WS_OVERFLOW_POLICY must be one of {', '.join(WS_OVERFLOW_POLICIES)}")
+
+# Mainapp can run as several workers and nodes. Clients are registered
+# to WS_REGISTRY_KEY hash with the worker holding their websocket, and
+# subscription changes are published to the control channel of that
+# worker: WS_CONTROL_CHANNEL:{worker}. Messages to all workers go to
+# WS_CONTROL_CHANNEL. Workers refresh their heartbeat in WS_WORKERS_KEY
+# and the client statistics of /api/streams/clients every
+# WS_WORKER_HEARTBEAT seconds.
+WORKER_ID = f"{gethostname()}:{getpid()}"
+WS_REGISTRY_KEY = environ.get('WS_REGISTRY_KEY') or 'ws:clients'
+WS_CONTROL_CHANNEL = environ.get('WS_CONTROL_CHANNEL') or 'ws:control'
+WS_WORKERS_KEY = environ.get('WS_WORKERS_KEY') or 'ws:workers'
+WS_WORKER_HEARTBEAT = float(environ.get('WS_WORKER_HEARTBEAT') or 5)
+# Available streams are cached and refreshed in the background every
+# WS_STREAMS_REFRESH_INTERVAL seconds, and right away when the stream
+# splitter publishes a refresh_streams message to WS_CONTROL_CHANNEL
+# for a new severity stream.
+WS_STREAMS_REFRESH_INTERVAL = float(environ.get('WS_STREAMS_REFRESH_INTERVAL') or 5)
+
+# Reconnecting clients resume from the last entry ID they saw on each
+# stream: /ws/{client_id}?resume=test:1700000000000-0,ERROR:1700000000000-1
+# Entries after it are replayed with XRANGE in batches of WS_READ_BATCH,
+# at most WS_RESUME_MAX per stream, before switching to live delivery.
+WS_RESUME_MAX = int(environ.get('WS_RESUME_MAX') or 10000)
+
+# Events are delivered as the JSON text they have in the stream. Frames
+# are built around it with string concatenation, so an event is parsed
+# and serialized at most once however many clients receive it. Frames
+# carry the stream and entry ID, batches the last ID of each stream, for
+# resuming.
+MESSAGE_FRAME = '{{"type":"message","stream":{},"id":"{}","data":{}}}'
+MESSAGES_FRAME = '{{"type":"messages","ids":{},"data":[{}]}}'
+
+def parse_id(entry_id: str) -> tuple:
+    """ Return stream entry ID as comparable (milliseconds, sequence) tuple. """
+    milliseconds, _, sequence = entry_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+def parse_resume(resume: str) -> dict:
+    """ Parse stream:id pairs of resume parameter, skipping malformed ones. """
+    positions = {}
+    for position in (resume or "").split(','):
+        stream, _, entry_id = position.rpartition(':')
+        try:
+            parse_id(entry_id)
+        except ValueError:
+            continue
+        if stream:
+            positions[stream] = entry_id
+    return positions
+
+# Fields of exact match filters, used as index keys in this order
+FILTER_INDEX_FIELDS = ("country_code", "city")
+
+@dataclass
+class EventFilter:
+    """
+    Filter of a subscription, events must match all given fields.
+    Predicates are compiled once when the filter is created.
+    """
+
+    hostname_prefix: str = None
+    country_code: str = None
+    city: str = None
+    message: str = None
+    predicates: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        predicates = []
+        if self.hostname_prefix:
+            predicates.append(lambda event, prefix=self.hostname_prefix:
+                              str(event.get("hostname", "")).startswith(prefix))
+        for name in FILTER_INDEX_FIELDS:
+            if getattr(self, name):
+                predicates.append(lambda event, name=name, value=getattr(self, name):
+                                  event.get(name) == value)
+        if self.message:
+            predicates.append(lambda event, text=self.message:
+                              text in str(event.get("message", "")))
+        self.predicates = tuple(predicates)
+
+    def __bool__(self) -> bool:
+        return bool(self.predicates)
+
+    def matches(self, event: dict) -> bool:
+        """ Return True if event matches the filter. """
+        return all(predicate(event) for predicate in self.predicates)
+
+    def params(self) -> dict:
+        """ Return fields set in the filter. """
+        return {
+            name: value for name, value in (
+                ("hostname_prefix", self.hostname_prefix),
+                ("country_code", self.country_code),
+                ("city", self.city),
+                ("message", self.message))
+            if value
+        }
+
+class FilterIndex:
+    """
+    Filtered subscriptions of a stream. Filters are indexed by the value
+    of an exact match field or by hostname prefix, so an event is only
+    tested against filters that could match it. Filters with just a
+    message substring are tested against every event.
+    """
+    def __init__(self):
+        self.filters: dict = {}
+        self.exact: dict = {name: {} for name in FILTER_INDEX_FIELDS}
+        self.prefixes: dict = {}
+        # Number of indexed prefixes by length
+        self.prefix_lengths: Counter = Counter()
+        self.unindexed: set = set()
+
+    def __len__(self) -> int:
+        return len(self.filters)
+
+    def index_for(self, event_filter: EventFilter) -> tuple:
+        """ Return index and key holding event_filter, (None, None) if unindexed. """
+        for name in FILTER_INDEX_FIELDS:
+            if getattr(event_filter, name):
+                return self.exact[name], getattr(event_filter, name)
+        if event_filter.hostname_prefix:
+            return self.prefixes, event_filter.hostname_prefix
+        return None, None
+
+    def add(self, client_id: int, event_filter: EventFilter) -> None:
+        """ Add or replace filter of client. """
+        self.remove(client_id)
+        self.filters[client_id] = event_filter
+        index, key = self.index_for(event_filter)
+        if index is None:
+            self.unindexed.add(client_id)
+            return
+        if index is self.prefixes and key not in index:
+            self.prefix_lengths[len(key)] += 1
+        index.setdefault(key, set()).add(client_id)
+
+    def remove(self, client_id: int) -> None:
+        """ Remove filter of client. """
+        event_filter = self.filters.pop(client_id, None)
+        if event_filter is None:
+            return
+        index, key = self.index_for(event_filter)
+        if index is None:
+            self.unindexed.discard(client_id)
+            return
+        client_ids = index[key]
+        client_ids.discard(client_id)
+        if client_ids:
+            return
+        del index[key]
+        if index is self.prefixes:
+            self.prefix_lengths[len(key)] -= 1
+            if not self.prefix_lengths[len(key)]:
+                del self.prefix_lengths[len(key)]
+
+    def candidates(self, event: dict) -> set:
+        """ Return clients whose filters could match event. """
+        candidates = set(self.unindexed)
+        for name, index in self.exact.items():
+            candidates.update(index.get(event.get(name), ()))
+        hostname = str(event.get("hostname", ""))
+        for length in self.prefix_lengths:
+            candidates.update(self.prefixes.get(hostname[:length], ()))
+        return candidates
+
+    def select(self, events: list) -> dict:
+        """ Return (entry ID, JSON text) events matching the filter of each client. """
+        selected = {}
+        for entry_id, text in events:
+            event = orjson.loads(text)
+            if not isinstance(event, dict):
+                continue
+            for client_id in self.candidates(event):
+                if self.filters[client_id].matches(event):
+                    selected.setdefault(client_id, []).append((entry_id, text))
+        return selected
+
 @dataclass
 class WebsocketClientConnection:
     """ Class for WebSocket client connection. """
 
     websocket: WebSocket
-    streams: dict
+    streams: set
+    # Coalescing window in seconds, 0 sends every event on its own
+    batch_window: float = 0
+    batch_max: int = WS_BATCH_MAX
+    # Batched (stream, entry ID, JSON text) events
+    pending: list = field(default_factory=list)
+    flush_task: asyncio.Task = None
+    # Live events buffered by stream while older entries are replayed
+    resuming: dict = field(default_factory=dict)
+    # Replayed position by stream, live events up to it are skipped
+    replayed: dict = field(default_factory=dict)
+    # Filters of filtered subscriptions by stream
+    filters: dict = field(default_factory=dict)
+    overflow: str = WS_OVERFLOW_POLICY
+    queue_size: int = WS_SEND_QUEUE_SIZE
+    queue: deque = field(default_factory=deque)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    writer_task: asyncio.Task = None
+    sent: int = 0
+    dropped: int = 0
+    # Events dropped since the last skipped marker
+    skipped: int = 0
+
+    def enqueue(self, frame: str, events: int = 0) -> bool:
+        """
+        Queue serialized frame holding events for the writer applying
+        the overflow policy. Returns False if the client should be
+        disconnected.
+        """
+        if len(self.queue) >= self.queue_size:
+            if self.overflow == "disconnect":
+                return False
+            _, dropped = self.queue.popleft()
+            self.dropped += dropped
+            if self.overflow == "skip_marker":
+                self.skipped += dropped
+        self.queue.append((frame, events))
+        self.ready.set()
+        return True
+
+    def stats(self) -> dict:
+        """ Return send queue statistics. """
+        return {
+            "streams": sorted(self.streams),
+            "filters": {stream: event_filter.params() for stream, event_filter in self.filters.items()},
+            "overflow": self.overflow,
+            "queue_depth": len(self.queue),
+            "queue_size": self.queue_size,
+            "sent": self.sent,
+            "dropped": self.dropped
+        }
 
     def add_stream(self, stream):
         """ Add stream to the client. """
-        self.streams[stream] = ">"
+        self.streams.add(stream)
 
     def remove_stream(self, stream):
         """ Remove stream from the client. """
-        if stream in self.streams:
-            del self.streams[stream]
+        self.streams.discard(stream)
+        self.filters.pop(stream, None)
 
 # Create FastAPI app instance
 app = FastAPI()
 
-# Create synchronous connection pool for Redis
+# Create synchronous connection pool for Redis.
+# Binary msgpack fields survive decoding as surrogate escaped strings.
 rpool = redis.asyncio.Redis(
     host=REDIS_HOST,
     port=REDIS_PORT,
-    decode_responses=True
+    decode_responses=True,
+    encoding_errors='surrogateescape'
 )
 
+def encode_event(payload: dict) -> str:
+    """
+    Return stream entry as event JSON text. Entries with a json field
+    are passed as is, others are decoded and serialized once.
+    """
+    if "json" in payload:
+        return payload["json"]
+    return orjson.dumps(decode_event(payload)).decode()
+
+def decode_event(payload: dict) -> dict:
+    """
+    Decode stream entry fields to event dictionary.
+    Entries have either a json field, a msgpack field or one field per
+    event attribute.
+    """
+    if "json" in payload:
+        return json.loads(payload["json"])
+    if "msgpack" in payload:
+        return msgpack.unpackb(payload["msgpack"].encode('utf-8', 'surrogateescape'))
+    event = dict(payload)
+    if "timestamp" in event:
+        # Parses the number as int or float
+        event["timestamp"] = json.loads(event["timestamp"])
+    return event
+
+class InfoSampler:
+    """ Cached snapshot of selected Redis INFO sections. """
+    def __init__(self, sections: list = INFO_SECTIONS):
+        self.sections = sections
+        self.snapshot: dict = {}
+        # Fields changed by the latest sample
+        self.delta: dict = {}
+        self.version = 0
+
+    async def sample(self) -> None:
+        """ Read INFO sections in one round trip and update the snapshot. """
+        async with rpool.pipeline(transaction=False) as pipe:
+            for section in self.sections:
+                pipe.info(section)
+            sections = await pipe.execute()
+        snapshot = {}
+        for section in sections:
+            snapshot.update(section)
+        self.delta = {key: value for key, value in snapshot.items() if self.snapshot.get(key) != value}
+        self.snapshot = snapshot
+        self.version += 1
+
+    async def run(self) -> None:
+        """ Sample INFO every INFO_SAMPLE_INTERVAL seconds. """
+        while True:
+            try:
+                await self.sample()
+            except redis.exceptions.RedisError as err:
+                print(f"INFO sampling failed: {err}")
+            await asyncio.sleep(INFO_SAMPLE_INTERVAL)
+
+    def changes_since(self, version: int) -> dict:
+        """ Return fields changed since snapshot version, all of them for older versions. """
+        if version == self.version:
+            return {}
+        if version == self.version - 1:
+            return self.delta
+        return self.snapshot
+
+info_sampler = InfoSampler()
+
 # Get INFO from redis
 async def get_redis_info():
-    return await rpool.info()
+    return info_sampler.snapshot
 
 class ConnectionManager:
     """ Class for managing WebSocket connections"""
@@ -54,20 +393,382 @@ class ConnectionManager:
         self.active_connections: dict = {}
         self.rconn = rpool
         self.available_streams = {}
+        self.streams_changed = asyncio.Event()
         self.splitter_active = False
+        # Filtered subscriptions of each stream
+        self.filters: dict = {}
+        # Shared reader task of each subscribed stream and an event set
+        # once the reader knows where it starts
+        self.readers: dict = {}
+        self.readers_started: dict = {}
 
-    async def connect(self, websocket: WebSocket, client_id: int) -> None:
-        """ Accept WebSocket connection and subscribe to available streams. """
+    async def connect(
+        self,
+        websocket: WebSocket,
+        client_id: int,
+        batch_window_ms: int = 0,
+        batch_max: int = WS_BATCH_MAX,
+        overflow: str = WS_OVERFLOW_POLICY,
+        resume: dict = None
+        ) -> WebsocketClientConnection:
+        """
+        Accept WebSocket connection, subscribe to available streams and
+        start the writer of the client. Batched clients are told the
+        window and size they got. Streams in resume are replayed from
+        the given entry IDs. Available streams come from the cache kept
+        by refresh_streams. Returns the new connection.
+        """
         await websocket.accept()
-        await self.update_available_streams()
-        self.active_connections[client_id] = WebsocketClientConnection(
+        connection = WebsocketClientConnection(
             websocket=websocket,
-            streams=self.available_streams
+            streams=set(self.available_streams),
+            batch_window=min(max(batch_window_ms, 0), WS_BATCH_WINDOW_MAX_MS) / 1000,
+            batch_max=min(max(batch_max, 1), WS_BATCH_MAX),
+            overflow=overflow if overflow in WS_OVERFLOW_POLICIES else WS_OVERFLOW_POLICY
         )
+        if connection.batch_window:
+            await websocket.send_json({
+                'type': 'batching',
+                'data': {
+                    'batch_window_ms': round(connection.batch_window * 1000),
+                    'batch_max': connection.batch_max
+                }})
+        resume = {stream: last_id for stream, last_id in (resume or {}).items() if stream in connection.streams}
+        for stream in resume:
+            connection.resuming[stream] = []
+        # A reconnecting client replaces its previous connection
+        previous = self.active_connections.get(client_id)
+        if previous is not None:
+            self.disconnect(client_id, previous)
+        self.active_connections[client_id] = connection
+        await self.rconn.hset(WS_REGISTRY_KEY, client_id, WORKER_ID)
+        connection.writer_task = asyncio.create_task(self.write(client_id, connection))
+        for stream, last_id in resume.items():
+            asyncio.create_task(self.resume(client_id, connection, stream, last_id))
+        for stream in self.available_streams:
+            self.start_reader(stream)
+        return connection
 
-    def disconnect(self, client_id: int) -> None:
-        """ On client disconnection remove client from active connections. """
+    async def resume(
+        self,
+        client_id: int,
+        connection: WebsocketClientConnection,
+        stream: str,
+        last_id: str
+        ) -> None:
+        """
+        Replay entries of stream after last_id to client in batches, then
+        switch it to live delivery. Live events read meanwhile were
+        buffered and are sent after the replayed ones, skipping those
+        already replayed.
+        """
+        replayed = 0
+        complete = False
+        # Entries after the reader's start are delivered live, so the
+        # replay must not end before it
+        await self.start_reader(stream).wait()
+        try:
+            while replayed < WS_RESUME_MAX:
+                count = min(WS_READ_BATCH, WS_RESUME_MAX - replayed)
+                entries = await self.rconn.xrange(stream, min=f"({last_id}", count=count)
+                if self.active_connections.get(client_id) is not connection:
+                    return
+                if entries:
+                    last_id = entries[-1][0]
+                    replayed += len(entries)
+                    events = [(entry_id, encode_event(payload)) for entry_id, payload in entries]
+                    event_filter = connection.filters.get(stream)
+                    if event_filter:
+                        events = [event for event in events if event_filter.matches(orjson.loads(event[1]))]
+                    self.deliver(stream, events, [client_id], live=False)
+                if len(entries) < count:
+                    complete = True
+                    break
+        except redis.exceptions.RedisError as err:
+            print(f"Resuming {stream} for {client_id} failed: {err}")
+        if self.active_connections.get(client_id) is not connection:
+            return
+        buffered = connection.resuming.pop(stream, [])
+        self.flush(client_id)
+        self.enqueue(
+            orjson.dumps({'type': 'resume', 'data': {'stream': stream, 'replayed': replayed, 'complete': complete}}).decode(),
+            client_id)
+        connection.replayed[stream] = parse_id(last_id)
+        self.deliver(stream, buffered, [client_id])
+
+    def disconnect(self, client_id: int, connection: WebsocketClientConnection) -> None:
+        """
+        On client disconnection remove connection from active connections.
+        Nothing is done if the client has already reconnected.
+        """
+        if connection is None or self.active_connections.get(client_id) is not connection:
+            return
         del self.active_connections[client_id]
+        for stream in list(connection.filters):
+            self.remove_filter(client_id, stream)
+        for task in (connection.flush_task, connection.writer_task):
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+        asyncio.create_task(self.unregister(client_id, connection))
+
+    async def unregister(self, client_id: int, connection: WebsocketClientConnection) -> None:
+        """
+        Remove disconnected client from the registry unless it reconnected
+        to this or another worker.
+        """
+        try:
+            worker = await self.rconn.hget(WS_REGISTRY_KEY, client_id)
+            if worker == WORKER_ID and self.active_connections.get(client_id) in (None, connection):
+                await self.rconn.hdel(WS_REGISTRY_KEY, client_id)
+        except redis.exceptions.RedisError as err:
+            print(f"Unregistering {client_id} failed: {err}")
+
+    async def control(self, message: dict) -> bool:
+        """
+        Apply control message to its client on the worker holding it.
+        Returns False if the client isn't connected to any worker.
+        """
+        client_id = message["client_id"]
+        if client_id in self.active_connections:
+            self.apply(message)
+            return True
+        worker = await self.rconn.hget(WS_REGISTRY_KEY, client_id)
+        if worker is None:
+            return False
+        if not await self.rconn.publish(f"{WS_CONTROL_CHANNEL}:{worker}", orjson.dumps(message)):
+            # Nobody listens on the channel, the worker is gone
+            await self.rconn.hdel(WS_REGISTRY_KEY, client_id)
+            return False
+        return True
+
+    def apply(self, message: dict) -> None:
+        """ Apply control message to clients of this worker. """
+        action = message["action"]
+        if action == "refresh_streams":
+            self.streams_changed.set()
+            return
+        if action == "unsubscribe_all":
+            for client_id in list(self.active_connections):
+                self.unsubscribe(client_id, message["stream"])
+            return
+        if message["client_id"] not in self.active_connections:
+            return
+        if action == "subscribe":
+            self.subscribe(message["client_id"], message["stream"], EventFilter(**message["filter"]))
+        elif action == "unsubscribe":
+            self.unsubscribe(message["client_id"], message["stream"])
+
+    async def listen_control(self) -> None:
+        """ Apply control messages published to this worker and to all workers. """
+        while True:
+            try:
+                async with self.rconn.pubsub() as pubsub:
+                    await pubsub.subscribe(f"{WS_CONTROL_CHANNEL}:{WORKER_ID}", WS_CONTROL_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        try:
+                            self.apply(orjson.loads(message["data"]))
+                        except Exception as err:
+                            print(f"Ignoring bad control message {message['data']!r}: {err!r}")
+            except redis.exceptions.RedisError as err:
+                print(f"Control channel failed: {err}")
+                await asyncio.sleep(1)
+
+    async def heartbeat(self) -> None:
+        """ Refresh heartbeat and client statistics of this worker. """
+        while True:
+            try:
+                async with self.rconn.pipeline(transaction=False) as pipe:
+                    pipe.zadd(WS_WORKERS_KEY, {WORKER_ID: time()})
+                    # Forget workers that stopped without leaving
+                    pipe.zremrangebyscore(WS_WORKERS_KEY, "-inf", f"({time() - WS_WORKER_HEARTBEAT * 3}")
+                    pipe.set(
+                        f"{WS_WORKERS_KEY}:{WORKER_ID}",
+                        orjson.dumps({
+                            client_id: connection.stats()
+                            for client_id, connection in self.active_connections.items()
+                        }, option=orjson.OPT_NON_STR_KEYS),
+                        ex=max(1, round(WS_WORKER_HEARTBEAT * 3)))
+                    await pipe.execute()
+            except redis.exceptions.RedisError as err:
+                print(f"Heartbeat failed: {err}")
+            await asyncio.sleep(WS_WORKER_HEARTBEAT)
+
+    async def live_workers(self) -> list:
+        """ Return workers with a recent heartbeat. """
+        return await self.rconn.zrangebyscore(WS_WORKERS_KEY, time() - WS_WORKER_HEARTBEAT * 3, "+inf")
+
+    async def write(self, client_id: int, connection: WebsocketClientConnection) -> None:
+        """ Send queued frames of client until it disconnects. """
+        try:
+            while True:
+                if not connection.queue:
+                    connection.ready.clear()
+                    await connection.ready.wait()
+                    continue
+                if connection.skipped:
+                    skipped, connection.skipped = connection.skipped, 0
+                    await connection.websocket.send_text(
+                        orjson.dumps({'type': 'skipped', 'data': {'count': skipped}}).decode())
+                frame, _ = connection.queue.popleft()
+                await connection.websocket.send_text(frame)
+                connection.sent += 1
+        except Exception as err:
+            print(f"Sending to {client_id} failed: {err!r}")
+            self.disconnect(client_id, connection)
+
+    def enqueue(self, frame: str, client_id: int, events: int = 0) -> None:
+        """ Queue frame to client, disconnecting it if its policy says so. """
+        connection = self.active_connections.get(client_id)
+        if connection is not None and not connection.enqueue(frame, events):
+            print(f"Disconnecting slow client {client_id}")
+            self.disconnect(client_id, connection)
+            # Close code 1013: try again later
+            asyncio.create_task(connection.websocket.close(code=1013))
+
+    def subscribe(self, client_id: int, stream: str, event_filter: EventFilter = None) -> None:
+        """
+        Subscribe client to stream. With event_filter the client only
+        gets matching events, replacing its earlier subscription.
+        """
+        connection = self.active_connections[client_id]
+        if event_filter:
+            connection.streams.discard(stream)
+            connection.filters[stream] = event_filter
+            self.filters.setdefault(stream, FilterIndex()).add(client_id, event_filter)
+        else:
+            self.remove_filter(client_id, stream)
+            connection.add_stream(stream)
+        self.start_reader(stream)
+
+    def unsubscribe(self, client_id: int, stream: str) -> None:
+        """ Unsubscribe client from stream. Reader stops with the last subscriber. """
+        self.remove_filter(client_id, stream)
+        self.active_connections[client_id].remove_stream(stream)
+
+    def remove_filter(self, client_id: int, stream: str) -> None:
+        """ Remove filtered subscription of client to stream. """
+        connection = self.active_connections.get(client_id)
+        if connection is not None:
+            connection.filters.pop(stream, None)
+        index = self.filters.get(stream)
+        if index is not None:
+            index.remove(client_id)
+            if not index:
+                del self.filters[stream]
+
+    def subscribers(self, stream: str) -> list:
+        """ Return IDs of clients subscribed to the whole stream. """
+        return [
+            client_id for client_id, connection in self.active_connections.items()
+            if stream in connection.streams
+        ]
+
+    def start_reader(self, stream: str) -> asyncio.Event:
+        """
+        Start shared reader of stream unless it's running. Returns event
+        set once the reader has its start position or has stopped.
+        """
+        if stream not in self.readers or self.readers[stream].done():
+            started = asyncio.Event()
+            self.readers[stream] = asyncio.create_task(self.read_stream(stream, started))
+            self.readers_started[stream] = started
+        return self.readers_started[stream]
+
+    async def read_stream(self, stream: str, started: asyncio.Event) -> None:
+        """
+        Read new entries of stream in batches and broadcast them to every
+        subscriber, filtered subscribers get the events matching their
+        filters. Stops when the stream has no subscribers left.
+        """
+        last_id = None
+        try:
+            while self.subscribers(stream) or stream in self.filters:
+                try:
+                    if last_id is None:
+                        # Deliver entries added after the reader started
+                        newest = await self.rconn.xrevrange(stream, count=1)
+                        last_id = newest[0][0] if newest else "0-0"
+                        started.set()
+                    data = await self.rconn.xread(
+                        streams={stream: last_id},
+                        count=WS_READ_BATCH,
+                        block=WS_READ_BLOCK_MS)
+                except redis.exceptions.RedisError as err:
+                    print(f"Reading {stream} failed: {err}")
+                    await asyncio.sleep(1)
+                    continue
+                for _, entries in data:
+                    last_id = entries[-1][0]
+                    events = [(entry_id, encode_event(payload)) for entry_id, payload in entries]
+                    self.deliver(stream, events, self.subscribers(stream))
+                    if stream in self.filters:
+                        for client_id, selected in self.filters[stream].select(events).items():
+                            self.deliver(stream, selected, [client_id])
+        finally:
+            started.set()
+
+    def deliver(self, stream: str, events: list, client_ids: list, live: bool = True) -> None:
+        """
+        Queue (entry ID, JSON text) events of stream to clients.
+        Unbatched clients share the same frames. Batched clients get them
+        added to their pending batch, which is queued when full or when
+        the window closes. Live events to clients resuming the stream
+        are buffered until the replay is done.
+        """
+        frames = None
+        for client_id in client_ids:
+            connection = self.active_connections.get(client_id)
+            if connection is None:
+                continue
+            if live and stream in connection.resuming:
+                connection.resuming[stream].extend(events)
+                continue
+            if live and stream in connection.replayed:
+                # The stream reader can be behind the replay
+                position = connection.replayed[stream]
+                unseen = [event for event in events if parse_id(event[0]) > position]
+                if unseen:
+                    del connection.replayed[stream]
+                if len(unseen) < len(events):
+                    if unseen:
+                        self.deliver(stream, unseen, [client_id], live=False)
+                    continue
+            if not connection.batch_window:
+                if frames is None:
+                    quoted = orjson.dumps(stream).decode()
+                    frames = [MESSAGE_FRAME.format(quoted, entry_id, text) for entry_id, text in events]
+                for frame in frames:
+                    self.enqueue(frame, client_id, 1)
+                continue
+            connection.pending.extend((stream, entry_id, text) for entry_id, text in events)
+            if len(connection.pending) >= connection.batch_max:
+                self.flush(client_id, full_only=True)
+            if connection.flush_task is None and client_id in self.active_connections:
+                connection.flush_task = asyncio.create_task(self.flush_later(client_id))
+
+    def flush(self, client_id: int, full_only: bool = False) -> None:
+        """
+        Queue pending events of client in frames of at most batch_max.
+        With full_only the remainder waits for the window to close.
+        """
+        connection = self.active_connections.get(client_id)
+        while connection and connection.pending and (not full_only or len(connection.pending) >= connection.batch_max):
+            batch = connection.pending[:connection.batch_max]
+            del connection.pending[:connection.batch_max]
+            ids = {stream: entry_id for stream, entry_id, _ in batch}
+            self.enqueue(
+                MESSAGES_FRAME.format(orjson.dumps(ids).decode(), ','.join(text for _, _, text in batch)),
+                client_id,
+                len(batch))
+
+    async def flush_later(self, client_id: int) -> None:
+        """ Flush pending events of client when its window closes. """
+        connection = self.active_connections[client_id]
+        await asyncio.sleep(connection.batch_window)
+        connection.flush_task = None
+        self.flush(client_id)
 
     async def update_available_streams(self) -> dict:
         """
@@ -87,17 +788,6 @@ class ConnectionManager:
             for severity in res:
                 avail[severity[0]] = ">"
 
-                # If consumer group for severity doesn't exist, create it
-                if severity[0] not in self.available_streams:
-                    try:
-                        await self.rconn.xgroup_create(
-                            name=severity[0],
-                            groupname=REDIS_CONSUMER_GROUP,
-                            mkstream=False
-                        )
-                    except redis.exceptions.ResponseError:
-                        pass
-
         # If no streams are available and splitter is not active.
         # Subscribe to REDIS_STREAM_NAME
         if len(avail) == 0 and not self.splitter_active:
@@ -105,6 +795,43 @@ class ConnectionManager:
         self.available_streams = avail
         return avail
 
+    async def refresh_streams(self) -> None:
+        """ Refresh available streams periodically or when notified of changes. """
+        while True:
+            try:
+                await asyncio.wait_for(self.streams_changed.wait(), WS_STREAMS_REFRESH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.streams_changed.clear()
+            try:
+                await self.update_available_streams()
+            except redis.exceptions.RedisError as err:
+                print(f"Refreshing streams failed: {err}")
+
+    async def delete_legacy_consumers(self, streams: list) -> int:
+        """
+        Delete consumer-{client_id} consumers left in REDIS_CONSUMER_GROUP
+        of streams by versions reading with a consumer per client, and
+        with them their pending entries. Returns number of pending
+        entries deleted.
+        """
+        deleted = 0
+        for stream in streams:
+            try:
+                consumers = await self.rconn.xinfo_consumers(stream, REDIS_CONSUMER_GROUP)
+            except redis.exceptions.ResponseError:
+                # No stream or group
+                continue
+            legacy = [consumer["name"] for consumer in consumers if consumer["name"].startswith("consumer-")]
+            if not legacy:
+                continue
+            async with self.rconn.pipeline(transaction=False) as pipe:
+                for name in legacy:
+                    pipe.xgroup_delconsumer(stream, REDIS_CONSUMER_GROUP, name)
+                deleted += sum(await pipe.execute())
+            print(f"Deleted {len(legacy)} legacy consumers from {stream}")
+        return deleted
+
     def activate_splitter(self) -> None:
         """ Set stream splitter status to active. """
         self.splitter_active = True
@@ -114,8 +841,8 @@ class ConnectionManager:
         await self.active_connections[client_id].websocket.send_text(message)
     
     async def send_client_json(self, message: dict, client_id: int) -> None:
-        """ Send dictionary as JSON to client_id. """
-        await self.active_connections[client_id].websocket.send_json(message)
+        """ Queue dictionary to be sent as JSON to client_id. """
+        self.enqueue(orjson.dumps(message).decode(), client_id)
 
     async def send_broadcast(self, message: str) -> None:
         """ Send broadcast message to all active clients. """
@@ -126,28 +853,43 @@ manager = ConnectionManager()
 
 @app.on_event("startup")
 async def startup_event():
-    """ Initialise Redis database on server startup. """
-
-    # Remove old consumer IDs and severities if they exist.
-    await rpool.delete("consumerids")
-    await rpool.delete("severities")
+    """
+    Initialise Redis database on server startup. Workers start one at a
+    time and only the first live one initialises.
+    """
+    async with rpool.lock(f"{WS_WORKERS_KEY}:startup", timeout=30, blocking_timeout=60):
+        # A restarted worker may have the same ID as before
+        if not set(await manager.live_workers()) - {WORKER_ID}:
+            # Remove old consumer IDs, severities and clients if they exist.
+            await rpool.delete("consumerids", "severities", WS_REGISTRY_KEY, WS_WORKERS_KEY)
 
-    # Delete existing stream if it exists
-    await rpool.delete(REDIS_STREAM_NAME)
+            # Delete existing stream if it exists
+            await rpool.delete(REDIS_STREAM_NAME)
 
-    # Create consumer group
-    await rpool.xgroup_create(
-        name=REDIS_STREAM_NAME,
-        groupname=REDIS_CONSUMER_GROUP,
-        mkstream = True
-    )
+            # Create consumer group
+            await rpool.xgroup_create(
+                name=REDIS_STREAM_NAME,
+                groupname=REDIS_CONSUMER_GROUP,
+                mkstream = True
+            )
+        await rpool.zadd(WS_WORKERS_KEY, {WORKER_ID: time()})
+    await manager.delete_legacy_consumers([REDIS_STREAM_NAME, *await manager.update_available_streams()])
+    asyncio.create_task(info_sampler.run())
+    asyncio.create_task(manager.listen_control())
+    asyncio.create_task(manager.refresh_streams())
+    asyncio.create_task(manager.heartbeat())
 
 @app.on_event("shutdown")
-def shutdown_event() -> None:
-    """ Disconnect all active connections on shutdown. """
+async def shutdown_event() -> None:
+    """ Disconnect all active connections and leave the registry on shutdown. """
     print("shutting down")
-    for client_id in manager.active_connections:
-        manager.disconnect(client_id)
+    connections = list(manager.active_connections.items())
+    for client_id, connection in connections:
+        manager.disconnect(client_id, connection)
+    for client_id, connection in connections:
+        await manager.unregister(client_id, connection)
+    await rpool.zrem(WS_WORKERS_KEY, WORKER_ID)
+    await rpool.delete(f"{WS_WORKERS_KEY}:{WORKER_ID}")
 
 @app.get("/api/clientid", response_class=JSONResponse)
 async def get_clientid():
@@ -156,112 +898,127 @@ async def get_clientid():
     return JSONResponse(content={"response": "ok", "client_id": client_id})
 
 @app.get("/api/streams/splitter", response_class=JSONResponse)
-async def register_stream_splitter():
-    """ Register Redis Gears function to split stream to severities. """
-    pass
+async def register_stream_splitter(engine: str = "python"):
+    """ Register stream splitter to split stream to severities with engine. """
+    if engine not in SPLITTER_ENGINES:
+        return JSONResponse(content={"response": "error", "error": f"Unknown engine {engine}"}, status_code=400)
+
     # Trim all old entries from the stream before registration.
-    print(f"Trimming {REDIS_STREAM_NAME} before registering Gears function")
+    print(f"Trimming {REDIS_STREAM_NAME} before registering stream splitter")
     await rpool.xtrim(
         name=REDIS_STREAM_NAME,
         maxlen=0,
         approximate=False)
 
-    # Remove REDIS_STREAM_NAME from all active connections so
-    # it's only being consumed by the Gears function.
+    # Remove REDIS_STREAM_NAME from all active connections of all
+    # workers so it's only being consumed by the stream splitter.
     print(f"Removing {REDIS_STREAM_NAME} from all clients")
-    for client_id in manager.active_connections:
-        manager.active_connections[client_id].remove_stream(REDIS_STREAM_NAME)
-    print("Registering severity splitter... ", end="")
+    await rpool.publish(WS_CONTROL_CHANNEL, orjson.dumps({"action": "unsubscribe_all", "stream": REDIS_STREAM_NAME}))
+    print(f"Registering severity splitter with {engine} engine")
 
-    await rpool.set("stream_splitter", 1)
+    await rpool.mset({"stream_splitter_engine": engine, "stream_splitter": 1})
     return JSONResponse(content={"response": "ok"})
 
 @app.get("/api/streams/update", response_class=JSONResponse)
 async def update_streams():
-    """ Update available streams for all clients. """
-    streams = await manager.update_available_streams()
-    return JSONResponse(content=streams)
+    """
+    Return available streams. They are cached and kept current by
+    refresh_streams, so polling this doesn't touch Redis.
+    """
+    return JSONResponse(content=manager.available_streams)
 
 @app.get("/api/streams/{client_id}/add/{stream}", response_class=JSONResponse)
-def add_stream_to_client(client_id: int, stream: str):
-    """ Add stream subscription to client. """
-    manager.active_connections[client_id].add_stream(stream)
-    return JSONResponse(content={"response": "ok"})
+async def add_stream_to_client(
+    client_id: int,
+    stream: str,
+    hostname_prefix: str = None,
+    country_code: str = None,
+    city: str = None,
+    message: str = None
+    ):
+    """
+    Add stream subscription to client on whichever worker holds it.
+    With filter parameters only matching events of the stream are sent.
+    """
+    event_filter = EventFilter(hostname_prefix, country_code, city, message)
+    return await control_client({
+        "action": "subscribe",
+        "client_id": client_id,
+        "stream": stream,
+        "filter": event_filter.params()
+    })
 
 @app.get("/api/streams/{client_id}/del/{stream}", response_class=JSONResponse)
-def del_stream_from_client(client_id: int, stream: str):
-    """ Delete stream subscription from a client. """
-    manager.active_connections[client_id].remove_stream(stream)
+async def del_stream_from_client(client_id: int, stream: str):
+    """ Delete stream subscription from a client on whichever worker holds it. """
+    return await control_client({"action": "unsubscribe", "client_id": client_id, "stream": stream})
+
+async def control_client(message: dict) -> JSONResponse:
+    """ Route control message to the worker of its client. """
+    if not await manager.control(message):
+        return JSONResponse(content={"response": "error", "error": f"Unknown client {message['client_id']}"}, status_code=404)
     return JSONResponse(content={"response": "ok"})
 
+@app.get("/api/streams/clients", response_class=JSONResponse)
+async def get_clients():
+    """
+    Get subscriptions and send queue statistics of clients connected to
+    any worker. Other workers report them with their heartbeat.
+    """
+    clients = {}
+    workers = [worker for worker in await manager.live_workers() if worker != WORKER_ID]
+    if workers:
+        for worker, worker_clients in zip(workers, await rpool.mget([f"{WS_WORKERS_KEY}:{worker}" for worker in workers])):
+            for client_id, client_stats in orjson.loads(worker_clients or "{}").items():
+                clients[client_id] = {**client_stats, "worker": worker}
+    for client_id, connection in manager.active_connections.items():
+        clients[client_id] = {**connection.stats(), "worker": WORKER_ID}
+    return JSONResponse(content=clients)
+
 @app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: int):
-    """ Define websocket endpoint for log stream. """
-    await manager.connect(websocket, client_id)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    client_id: int,
+    batch_window_ms: int = 0,
+    batch_max: int = WS_BATCH_MAX,
+    info_deltas: bool = False,
+    overflow: str = WS_OVERFLOW_POLICY,
+    resume: str = None
+    ):
+    """
+    Define websocket endpoint for log stream.
+    Events are sent by the shared stream readers, this keeps the
+    connection alive. Pings carry the sampled Redis INFO, with
+    info_deltas only the fields changed since the previous ping. With
+    resume entries after the given stream:id positions are replayed.
+    """
+    connection = await manager.connect(websocket, client_id, batch_window_ms, batch_max, overflow, parse_resume(resume))
     print(f"connected: {client_id}")
+    info_version = None
     try:
-        last_keepalive = time()
-        while True:
+        # Stops when the client reconnects with a new connection
+        while manager.active_connections.get(client_id) is connection:
             # Send ping every 5 seconds to make sure client connections
             # are still connected.
-            if time() - 5 > last_keepalive:
-                redis_info = await get_redis_info()
-                await manager.send_client_json({
-                    'type': 'ping',
-                    'data': {
-                        'timestamp': last_keepalive,
-                        'redis_info': redis_info
-                        }},
-                    client_id)
-                await websocket.receive_text()
-                last_keepalive = time()
-
-            # If we don't have any stream subscriptions sleep for 1 second
-            if len(manager.active_connections[client_id].streams) == 0:
-                await asyncio.sleep(1)
-                continue
-
-            # Read new entries from all subscribed streams.
-            # If we received data, send it to the client WebSocket.
-            data = await read_streams(client_id)
-            if len(data) > 0:
-                for contents in data:
-                    await manager.send_client_json({
-                        'type': 'message',
-                        'data': json.loads(contents["json"])},
-                        client_id)
-    except (ConnectionClosedOK, ConnectionClosedError):
+            await asyncio.sleep(WS_KEEPALIVE_INTERVAL)
+            if info_deltas:
+                redis_info = info_sampler.changes_since(info_version)
+            else:
+                redis_info = info_sampler.snapshot
+            info_version = info_sampler.version
+            # Pings bypass the send queue so the overflow policy can't
+            # drop them while the reply is waited for.
+            await websocket.send_json({
+                'type': 'ping',
+                'data': {
+                    'timestamp': time(),
+                    'redis_info': redis_info,
+                    'redis_info_delta': info_deltas
+                    }})
+            await websocket.receive_text()
+    except (ConnectionClosedOK, ConnectionClosedError, WebSocketDisconnect, KeyError):
         print(f"{client_id} disconnected")
-        manager.disconnect(client_id)
-
-async def read_streams(client_id: str):
-    """ Read entries from subscribed streams for client_id. """
-
-    consumername = f"consumer-{client_id}"
-    if client_id in manager.active_connections and len(manager.active_connections[client_id].streams) > 0:
-        response = []
-        try:
-            # Read up to 1 message from each subscribed stream.
-            # Call is blocking and we're waiting for 1 second for new
-            # events in the streams.
-            data = await rpool.xreadgroup(
-                groupname=REDIS_CONSUMER_GROUP,
-                consumername=consumername,
-                streams=manager.active_connections[client_id].streams,
-                count=1,
-                block=1000)
-            if len(data) > 0:
-                for entry in data:
-                    response.append(entry[1][0][1]) # Event data
-                    await rpool.xack(
-                        entry[0], # Stream name
-                        REDIS_CONSUMER_GROUP,
-                        entry[1][0][0] # Stream ID
-                    )
-        except redis.exceptions.DataError:
-            # If no streams are being consumed just return and try again later
-            pass
-        return response
+    manager.disconnect(client_id, connection)
 
 
 ### Log event modification routes
@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 
+import asyncio
+from dataclasses import dataclass, field
 from os import environ
+from time import time
 from typing import List, Tuple
 from pydantic import BaseModel
 
@@ -35,6 +38,18 @@ LOG_SCHEMA = (
 LOG_PREFIX = ["logs:"]
 IDX_NAME = "jsonIdx"
 
+# Log documents are partitioned as logs:{partition}:{id} by the stream
+# splitter, which registers every partition to LOG_PARTITIONS_KEY scored by
+# the end of its period. Each partition gets its own index
+# {IDX_NAME}:{partition}. Partitions that ended more than
+# LOG_RETENTION_SECONDS ago are dropped with their documents. The
+# splitter announces new partitions on LOG_PARTITIONS_CHANNEL so they are
+# indexed right away instead of on the next check.
+LOG_PARTITIONS_KEY = 'log_partitions'
+LOG_PARTITIONS_CHANNEL = environ.get('LOG_PARTITIONS_CHANNEL') or 'log_partitions'
+LOG_RETENTION_SECONDS = int(environ.get('LOG_RETENTION_SECONDS') or 7 * 86400)
+PARTITION_CHECK_INTERVAL = float(environ.get('PARTITION_CHECK_INTERVAL') or 10)
+
 AUTOCOMPLETE_DEFAULTS = [
     "@log_level:",
     "@hostname:",
@@ -52,26 +67,122 @@ rpool = redis.asyncio.Redis(
     decode_responses=True
 )
 
-client = rpool.ft(
-    index_name=IDX_NAME,
-)
+# Partitions with an index, newest first
+partitions: List[str] = []
+partitions_changed = asyncio.Event()
+
+def partition_index(partition: str) -> str:
+    """ Return index name of partition. """
+    return f"{IDX_NAME}:{partition}"
 
 async def create_index(
     idx_schema: Tuple = LOG_SCHEMA,
-    idx_prefix: List = LOG_PREFIX
+    idx_prefix: List = LOG_PREFIX,
+    idx_name: str = IDX_NAME
     ):
     """ Create index if it doesn't exist. """
 
+    client = rpool.ft(index_name=idx_name)
     definition = IndexDefinition(
         prefix=idx_prefix,
         index_type=IndexType.JSON
         )
     try:
-        #print(dir(client))
         await client.info()
     except redis.exceptions.ResponseError:
         await client.create_index(idx_schema, definition=definition)
 
+async def drop_legacy_index() -> None:
+    """
+    Drop the unpartitioned index on prefix logs: from older deployments.
+    It matches every partition too and would index all documents twice.
+    Documents are kept, they belong to the partition indexes.
+    """
+    try:
+        await rpool.ft(IDX_NAME).dropindex(delete_documents=False)
+        print(f"Dropped legacy index {IDX_NAME}")
+    except redis.exceptions.ResponseError:
+        pass
+
+async def drop_partition(partition: str) -> None:
+    """ Drop index and documents of partition. """
+    try:
+        await rpool.ft(partition_index(partition)).dropindex(delete_documents=True)
+    except redis.exceptions.ResponseError:
+        # No index, remove the documents directly
+        async for key in rpool.scan_iter(match=f"{LOG_PREFIX[0]}{partition}:*", count=1000):
+            await rpool.unlink(key)
+    await rpool.zrem(LOG_PARTITIONS_KEY, partition)
+
+async def update_partitions() -> None:
+    """ Drop expired partitions and index new ones. """
+    global partitions
+
+    expired = await rpool.zrangebyscore(LOG_PARTITIONS_KEY, "-inf", time() - LOG_RETENTION_SECONDS)
+    for partition in expired:
+        print(f"Dropping log partition {partition}")
+        await drop_partition(partition)
+
+    live = await rpool.zrevrange(LOG_PARTITIONS_KEY, 0, -1)
+    for partition in live:
+        if partition not in partitions:
+            await create_index(
+                idx_prefix=[f"{LOG_PREFIX[0]}{partition}:"],
+                idx_name=partition_index(partition))
+    partitions = live
+
+async def manage_partitions() -> None:
+    """ Keep partition indexes and retention up to date. """
+    while True:
+        try:
+            await asyncio.wait_for(partitions_changed.wait(), PARTITION_CHECK_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        partitions_changed.clear()
+        try:
+            await update_partitions()
+        except redis.exceptions.RedisError as err:
+            print(f"Partition update failed: {err}")
+
+async def listen_partitions() -> None:
+    """ Wake up manage_partitions when the splitter adds a partition. """
+    while True:
+        try:
+            async with rpool.pubsub() as pubsub:
+                await pubsub.subscribe(LOG_PARTITIONS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        partitions_changed.set()
+        except redis.exceptions.RedisError as err:
+            print(f"Partition channel failed: {err}")
+            await asyncio.sleep(1)
+
+async def fan_out(command, *args, **kwargs) -> list:
+    """ Run FT command on every live partition concurrently. """
+    return await asyncio.gather(*[
+        getattr(rpool.ft(partition_index(partition)), command)(*args, **kwargs)
+        for partition in partitions
+    ])
+
+def sort_value(value):
+    """ Sort numeric values as numbers and others as strings. """
+    try:
+        return (0, float(value), "")
+    except (TypeError, ValueError):
+        return (1, 0, str(value))
+
+@dataclass
+class MergedSearchResult:
+    """ Search results merged from all partitions. """
+    total: int = 0
+    duration: float = 0
+    docs: list = field(default_factory=list)
+
+@dataclass
+class MergedAggregateResult:
+    """ Aggregate rows merged from all partitions. """
+    rows: list = field(default_factory=list)
+
 def generate_literal_query(cmd: str, idx: str, build_args):
     """ Return literal query. """
     literal_query = [cmd, idx]
@@ -84,13 +195,17 @@ def generate_literal_query(cmd: str, idx: str, build_args):
     return ' '.join(literal_query)
 
 async def search_index(query: str, start: int = 0, limit: int = 100, sortby_field: str = "timestamp", sort_asc: bool = False):
-    """ Search for query from index. """
+    """
+    Search for query from all partitions.
+    Every partition returns its first start + limit results, which are
+    merged by sortby_field before paging.
+    """
 
     while True:
         request = (
             Query(f"{query}")
             .sort_by(sortby_field, asc=sort_asc)
-            .paging(start, limit)
+            .paging(0, start + limit)
             .highlight()
             .return_fields(
                 "timestamp",
@@ -103,8 +218,15 @@ async def search_index(query: str, start: int = 0, limit: int = 100, sortby_fiel
             )
         )
 
-        literal_query = f"FT.SEARCH {IDX_NAME} \"{request.query_string()}\" {' '.join([str(x) for x in request.get_args()[1:]])}"
-        res = await client.search(request)
+        literal_query = f"FT.SEARCH {IDX_NAME}:<partition> \"{request.query_string()}\" {' '.join([str(x) for x in request.get_args()[1:]])}"
+        res = MergedSearchResult()
+        for partition_res in await fan_out("search", request):
+            res.total += partition_res.total
+            # Partitions are searched concurrently
+            res.duration = max(res.duration, partition_res.duration)
+            res.docs.extend(partition_res.docs)
+        res.docs.sort(key=lambda doc: sort_value(getattr(doc, sortby_field, None)), reverse=not sort_asc)
+        res.docs = res.docs[start:start + limit]
         return res, literal_query
 
 async def aggregate_by_field(query: str, field: str):
@@ -121,9 +243,15 @@ async def aggregate_by_field(query: str, field: str):
         .sort_by(Desc("@entries"))
     )
 
-    literal_query = generate_literal_query("FT.AGGREGATE", IDX_NAME, request.build_args())
-    res = None
-    res = await client.aggregate(request)
+    literal_query = generate_literal_query("FT.AGGREGATE", f"{IDX_NAME}:<partition>", request.build_args())
+    entries = {}
+    for partition_res in await fan_out("aggregate", request):
+        for row in partition_res.rows:
+            entries[row[1]] = entries.get(row[1], 0) + int(row[3])
+    res = MergedAggregateResult(rows=[
+        [field, value, "entries", count]
+        for value, count in sorted(entries.items(), key=lambda item: item[1], reverse=True)
+    ])
     return res, literal_query
 
 
@@ -144,9 +272,18 @@ async def get_cities_aggregate_by_coordinates(coordinates: str, distance: int, q
         .sort_by("@distance")
         .limit(0, 250)
     )
-    literal_query = generate_literal_query("FT.AGGREGATE", IDX_NAME, request.build_args())
-    res = None
-    res = await client.aggregate(request)
+    literal_query = generate_literal_query("FT.AGGREGATE", f"{IDX_NAME}:<partition>", request.build_args())
+    entries = {}
+    for partition_res in await fan_out("aggregate", request):
+        for row in partition_res.rows:
+            city = tuple(row[1:8:2])
+            entries[city] = entries.get(city, 0) + int(row[9])
+    res = MergedAggregateResult(rows=[
+        ["city", city, "distance", distance, "country_code", country_code,
+         "coordinates", coordinates, "entries", count]
+        for (city, distance, country_code, coordinates), count in sorted(
+            entries.items(), key=lambda item: float(item[0][1]))[:250]
+    ])
     return res, literal_query
 
 async def autocomplete_suggestion_add(idx: str, string: str, score: float = 1, increment=True):
@@ -170,7 +307,10 @@ async def startup_event():
     """ Initialize config on startup. """
     await autocomplete_delete("autocomplete")
     await autocomplete_add_defaults()
-    await create_index()
+    await drop_legacy_index()
+    await update_partitions()
+    asyncio.create_task(listen_partitions())
+    asyncio.create_task(manage_partitions())
 
 class SearchQuery(BaseModel):
     """ Search query definition. Accepted parameters are a query string. """
@@ -309,11 +449,13 @@ class TagValsQuery(BaseModel):
 @app.post("/api/search/tagvals/get", response_class=JSONResponse)
 async def get_tagvals(query: TagValsQuery):
     """ Get tagvals for indexed field. """
-    res = await client.tagvals(tagfield=query.field)
-    return JSONResponse(res)
+    res = set()
+    for partition_res in await fan_out("tagvals", tagfield=query.field):
+        res.update(partition_res)
+    return JSONResponse(sorted(res))
 
 async def main():
-    await create_index()
+    await update_partitions()
     await autocomplete_delete("autocomplete")
     await autocomplete_add_defaults()
     
@@ -339,5 +481,4 @@ async def main():
     print(result)
 
 if __name__ == '__main__':
-    import asyncio
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the stream splitter.
+
+engines: seeds a stream with n events and drains it with the Python
+engine (XREADGROUP + BatchWriters) and with the Redis Functions engine
+(FCALL split_batch), reporting events/sec for each.
+
+concurrency: drains n events with the Python engine at several writer
+concurrency levels, reporting events/sec and batch latency from read to
+commit. Latency to Redis is what concurrency hides, so run it against a
+remote Redis or through a proxy adding delay.
+
+Needs RedisJSON and RedisTimeSeries (Redis 7 for engines) at
+REDIS_HOST:REDIS_PORT, e.g. redis-stack-server. Writes severity streams,
+logs documents and time series like the splitter does, so use a scratch
+database.
+
+Usage:
+    python benchmark.py engines [n] [batch_size]
+    python benchmark.py concurrency [n] [batch_size] [--levels 1 2 4 8]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from streamsplitter import (
+    LOG_PARTITION_SECONDS,
+    LOG_PARTITIONS_CHANNEL,
+    LOG_PARTITIONS_KEY,
+    LOG_PREFIX,
+    REDIS_CONSUMER_GROUP,
+    SEVERITIES_KEY,
+    SEVERITY_STREAM_MAXLEN,
+    SPLITTER_BATCH_SIZE,
+    SPLITTER_TS_BUCKET_MS,
+    WS_CONTROL_CHANNEL,
+    BatchWriters,
+    load_function_library,
+    rpool,
+    severity_counter,
+    stats
+)
+
+STREAM = "benchmark:splitter"
+CONSUMER = "benchmark"
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+async def seed(n: int, batch_size: int) -> None:
+    """ Recreate benchmark stream and consumer group with n events. """
+    await rpool.delete(STREAM)
+    await rpool.xgroup_create(name=STREAM, groupname=REDIS_CONSUMER_GROUP, mkstream=True)
+    for offset in range(0, n, batch_size):
+        async with rpool.pipeline(transaction=False) as pipe:
+            for i in range(offset, min(n, offset + batch_size)):
+                pipe.xadd(STREAM, {"json": json.dumps({
+                    "timestamp": round(time.time() * 1000),
+                    "hostname": f"webserver-{i % 20}.example.com",
+                    "log_level": LOG_LEVELS[i % len(LOG_LEVELS)],
+                    "message": "1.2.3.4 requested / status 200",
+                    "city": "Helsinki",
+                    "coordinates": "24.933333,60.166667",
+                    "country_code": "FI"
+                })})
+            await pipe.execute()
+
+async def drain_python(batch_size: int, concurrency: int = 1) -> int:
+    """ Split benchmark stream with the Python engine. """
+    processed = stats.processed
+    writers = BatchWriters(concurrency)
+    try:
+        while True:
+            data = await rpool.xreadgroup(
+                groupname=REDIS_CONSUMER_GROUP,
+                consumername=CONSUMER,
+                streams={STREAM: ">"},
+                count=batch_size)
+            if not data or not data[0][1]:
+                break
+            await writers.put(data[0][0], data[0][1])
+        await writers.join()
+    finally:
+        await writers.close()
+    await severity_counter.flush()
+    return stats.processed - processed
+
+async def drain_functions(batch_size: int) -> int:
+    """ Split benchmark stream with the Redis Functions engine. """
+    processed = 0
+    while True:
+        count, _ = await rpool.fcall(
+            'split_batch',
+            3,
+            STREAM,
+            LOG_PARTITIONS_KEY,
+            SEVERITIES_KEY,
+            REDIS_CONSUMER_GROUP,
+            CONSUMER,
+            batch_size,
+            SEVERITY_STREAM_MAXLEN,
+            LOG_PREFIX,
+            LOG_PARTITION_SECONDS,
+            SPLITTER_TS_BUCKET_MS,
+            WS_CONTROL_CHANNEL,
+            LOG_PARTITIONS_CHANNEL
+        )
+        if count == 0:
+            break
+        processed += count
+    return processed
+
+async def concurrency(n: int, batch_size: int, levels: list) -> None:
+    """ Compare writer concurrency levels of the Python engine. """
+    try:
+        for level in levels:
+            await seed(n, batch_size)
+            stats.latencies.clear()
+            start = time.perf_counter()
+            processed = await drain_python(batch_size, level)
+            duration = time.perf_counter() - start
+            latency = stats.latency_ms()
+            print(
+                f"{level:>3} writers: {processed / duration:>9,.0f} events/sec, "
+                f"batch latency p50 {latency['p50']} ms, p99 {latency['p99']} ms"
+            )
+    finally:
+        await rpool.delete(STREAM)
+        await rpool.aclose()
+
+async def engines(n: int, batch_size: int) -> None:
+    """ Compare splitter engines. """
+    await load_function_library()
+    try:
+        for engine, drain in (("python", drain_python), ("functions", drain_functions)):
+            await seed(n, batch_size)
+            start = time.perf_counter()
+            processed = await drain(batch_size)
+            duration = time.perf_counter() - start
+            print(f"{engine:>10}: {processed} events in {duration:.3f}s, {processed / duration:,.0f} events/sec")
+    finally:
+        await rpool.delete(STREAM)
+        await rpool.aclose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream splitter benchmarks")
+    parser.add_argument("benchmark", choices=["engines", "concurrency"])
+    parser.add_argument("n", type=int, nargs="?", default=100000)
+    parser.add_argument("batch_size", type=int, nargs="?", default=SPLITTER_BATCH_SIZE)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    if args.benchmark == "engines":
+        asyncio.run(engines(args.n, args.batch_size))
+    else:
+        asyncio.run(concurrency(args.n, args.batch_size, args.levels))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!lua name=stream_splitter
+
+-- Redis Functions version of the stream splitter.
+-- Load with: FUNCTION LOAD REPLACE "$(cat stream_splitter.lua)"
+--
+-- FCALL split_batch 3 <stream> <partitions key> <severities key> <group>
+--     <consumer> <count> <severity maxlen> <log prefix> <partition seconds>
+--     <bucket ms> <control channel> <partitions channel>
+--
+-- Reads up to count new entries for consumer, copies them to severity
+-- streams, stores JSON documents as <log prefix><partition>:<id> and
+-- registers their partitions to <partitions key>, counts events per
+-- severity to the current time series bucket and acknowledges the
+-- entries. New severities are announced on the control channel and new
+-- partitions on the partitions channel.
+-- Everything runs atomically inside Redis.
+-- Returns number of processed entries and ID of the last one.
+--
+-- Severity streams, documents and ts:{severity} keys are named after the
+-- entries read, so they can't be declared in KEYS up front. The function
+-- is flagged no-cluster and only runs on a single shard Redis.
+
+local function decode_event(fields)
+    local payload = {}
+    for i = 1, #fields, 2 do
+        payload[fields[i]] = fields[i + 1]
+    end
+    if payload['json'] then
+        return cjson.decode(payload['json']), payload['json']
+    end
+    if payload['msgpack'] then
+        local event = cmsgpack.unpack(payload['msgpack'])
+        return event, cjson.encode(event)
+    end
+    if payload['timestamp'] then
+        payload['timestamp'] = tonumber(payload['timestamp'])
+    end
+    return payload, cjson.encode(payload)
+end
+
+local function split_batch(keys, args)
+    local stream = keys[1]
+    local partitions_key = keys[2]
+    local severities_key = keys[3]
+    local group = args[1]
+    local consumer = args[2]
+    local count = tonumber(args[3])
+    local maxlen = args[4]
+    local log_prefix = args[5]
+    local partition_seconds = tonumber(args[6])
+    local bucket_ms = tonumber(args[7])
+    local control_channel = args[8]
+    local partitions_channel = args[9]
+
+    local reply = redis.call('XREADGROUP', 'GROUP', group, consumer, 'COUNT', count, 'STREAMS', stream, '>')
+    if not reply then
+        return {0, ''}
+    end
+
+    local now = redis.call('TIME')
+    local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+    local bucket = math.floor(now_ms / bucket_ms) * bucket_ms
+
+    local ids = {}
+    local counts = {}
+    local partitions = {}
+    for _, entry in ipairs(reply[1][2]) do
+        local id = entry[1]
+        local fields = entry[2]
+        table.insert(ids, id)
+        local ok, event, encoded = pcall(decode_event, fields)
+        if ok and type(event) == 'table' and type(event['log_level']) == 'string' then
+            local severity = string.lower(event['log_level'])
+            redis.call('XADD', severity, 'MAXLEN', '~', maxlen, '*', unpack(fields))
+            -- Partition from the time in the entry ID
+            local seconds = math.floor(tonumber(string.match(id, '^(%d+)')) / 1000)
+            local partition = string.format('%d', seconds - seconds % partition_seconds)
+            if not partitions[partition] then
+                partitions[partition] = seconds - seconds % partition_seconds + partition_seconds
+                local added = redis.call('ZADD', partitions_key, 'NX', partitions[partition], partition)
+                if added == 1 and partitions_channel then
+                    redis.call('PUBLISH', partitions_channel, partition)
+                end
+            end
+            redis.call('JSON.SET', log_prefix .. partition .. ':' .. id, '$', encoded)
+            counts[severity] = (counts[severity] or 0) + 1
+        end
+    end
+
+    local new_severity = false
+    for severity, amount in pairs(counts) do
+        if tonumber(redis.call('ZINCRBY', severities_key, amount, severity)) == amount then
+            new_severity = true
+        end
+        redis.call(
+            'TS.ADD', 'ts:' .. severity, bucket, amount,
+            'ON_DUPLICATE', 'SUM',
+            'LABELS', 'log_level', severity, 'type', 'logs'
+        )
+    end
+
+    if new_severity and control_channel then
+        redis.call('PUBLISH', control_channel, '{"action": "refresh_streams"}')
+    end
+
+    if #ids > 0 then
+        redis.call('XACK', stream, group, unpack(ids))
+    end
+    return {#ids, ids[#ids] or ''}
+end
+
+redis.register_function{
+    function_name = 'split_batch',
+    callback = split_batch,
+    flags = {'no-cluster'}
+}
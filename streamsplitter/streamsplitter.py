@@ -1,29 +1,101 @@
 import asyncio
 import json
+import os
+import socket
+from collections import Counter, deque
 from dataclasses import dataclass
-from datetime import datetime
 from os import environ
-from time import time
+from time import perf_counter, time
 
+import msgpack
 import redis.asyncio
 import redis.exceptions
 
 from fastapi import FastAPI, BackgroundTasks
+from fastapi.responses import JSONResponse
 from redis import ResponseError
 
 REDIS_HOST = environ.get('REDIS_HOST') or 'localhost'
 REDIS_PORT = int(environ.get('REDIS_PORT') or '6379')
 REDIS_CONSUMER_GROUP = environ.get('REDIS_CONSUMER_GROUP') or 'streamsplitter'
 REDIS_STREAM_NAME = environ.get('REDIS_STREAM_NAME') or 'test'
+SEVERITY_STREAM_MAXLEN = int(environ.get('SEVERITY_STREAM_MAXLEN') or 2000000)
+
+# Entries read per XREADGROUP and milliseconds to block waiting for them.
+SPLITTER_BATCH_SIZE = int(environ.get('SPLITTER_BATCH_SIZE') or 100)
+SPLITTER_BLOCK_MS = int(environ.get('SPLITTER_BLOCK_MS') or 1000)
+# Batch size starts at SPLITTER_BATCH_SIZE and adapts between
+# SPLITTER_BATCH_MIN and SPLITTER_BATCH_MAX to the group lag checked every
+# SPLITTER_LAG_INTERVAL seconds. It doubles while the splitter is behind
+# and halves when caught up or when Redis answers the check slower than
+# SPLITTER_SLOW_REDIS_MS.
+SPLITTER_BATCH_MIN = int(environ.get('SPLITTER_BATCH_MIN') or 10)
+SPLITTER_BATCH_MAX = int(environ.get('SPLITTER_BATCH_MAX') or 2000)
+SPLITTER_LAG_INTERVAL = float(environ.get('SPLITTER_LAG_INTERVAL') or 1)
+SPLITTER_SLOW_REDIS_MS = float(environ.get('SPLITTER_SLOW_REDIS_MS') or 50)
+# REDIS_STREAM_NAME is trimmed to about REDIS_STREAM_MAXLEN entries by the
+# log generator. Lag above SPLITTER_TRIM_RISK_RATIO of it is at risk of
+# being trimmed before it's processed.
+REDIS_STREAM_MAXLEN = int(environ.get('REDIS_STREAM_MAXLEN') or 200000)
+SPLITTER_TRIM_RISK_RATIO = float(environ.get('SPLITTER_TRIM_RISK_RATIO') or 0.5)
+# Batches written to Redis concurrently by the python engine. The reader
+# stays at most SPLITTER_CONCURRENCY batches ahead of the writers.
+SPLITTER_CONCURRENCY = int(environ.get('SPLITTER_CONCURRENCY') or 4)
+
+# Every splitter instance is its own consumer in REDIS_CONSUMER_GROUP.
+SPLITTER_CONSUMER_NAME = (
+    environ.get('SPLITTER_CONSUMER_NAME')
+    or f"{REDIS_CONSUMER_GROUP}-{socket.gethostname()}-{os.getpid()}"
+)
+# Entries pending longer than SPLITTER_CLAIM_IDLE_MS are reclaimed from
+# other consumers every SPLITTER_CLAIM_INTERVAL seconds. Consumers with
+# nothing pending and idle for SPLITTER_CONSUMER_TTL_MS are removed.
+SPLITTER_CLAIM_IDLE_MS = int(environ.get('SPLITTER_CLAIM_IDLE_MS') or 30000)
+SPLITTER_CLAIM_INTERVAL = float(environ.get('SPLITTER_CLAIM_INTERVAL') or 5)
+SPLITTER_CONSUMER_TTL_MS = int(environ.get('SPLITTER_CONSUMER_TTL_MS') or 600000)
+# Seconds between publishing consumer statistics to SPLITTER_STATS_KEY.
+SPLITTER_STATS_INTERVAL = float(environ.get('SPLITTER_STATS_INTERVAL') or 5)
+SPLITTER_STATS_KEY = 'splitter:consumers'
+
+# Events are counted per severity in SPLITTER_TS_BUCKET_MS buckets and
+# flushed to ts:{severity} and severities every SPLITTER_TS_FLUSH_INTERVAL seconds.
+SPLITTER_TS_BUCKET_MS = int(environ.get('SPLITTER_TS_BUCKET_MS') or 100)
+SPLITTER_TS_FLUSH_INTERVAL = float(environ.get('SPLITTER_TS_FLUSH_INTERVAL') or 1)
+# New severities are announced on the control channel of mainapp so its
+# workers refresh their available streams right away.
+WS_CONTROL_CHANNEL = environ.get('WS_CONTROL_CHANNEL') or 'ws:control'
+REFRESH_STREAMS_MESSAGE = '{"action": "refresh_streams"}'
+
+# JSON documents are partitioned by the time their entry was added to the
+# stream: logs:{partition}:{id}, partition being the start of the
+# LOG_PARTITION_SECONDS period in epoch seconds (86400 daily, 3600 hourly).
+# Partitions are registered to LOG_PARTITIONS_KEY scored by their end, the
+# search service indexes them and drops them after retention. New
+# partitions are announced on LOG_PARTITIONS_CHANNEL so search indexes
+# them right away.
+LOG_PREFIX = 'logs:'
+LOG_PARTITION_SECONDS = int(environ.get('LOG_PARTITION_SECONDS') or 86400)
+LOG_PARTITIONS_KEY = 'log_partitions'
+LOG_PARTITIONS_CHANNEL = environ.get('LOG_PARTITIONS_CHANNEL') or 'log_partitions'
+# Events per severity, its members are the severity streams.
+SEVERITIES_KEY = 'severities'
+
+# Splitter engines, selected when the splitter is registered:
+# - python: batches are split by this service
+# - functions: batches are split inside Redis by the split_batch function
+SPLITTER_ENGINES = ("python", "functions")
+FUNCTION_LIBRARY_FILE = environ.get('FUNCTION_LIBRARY_FILE') or 'stream_splitter.lua'
 
 # Create FastAPI app instance
 app = FastAPI()
 
-# Create synchronous connection pool for Redis
+# Create synchronous connection pool for Redis.
+# Binary msgpack fields survive decoding as surrogate escaped strings.
 rpool = redis.asyncio.Redis(
     host=REDIS_HOST,
     port=REDIS_PORT,
-    decode_responses=True
+    decode_responses=True,
+    encoding_errors='surrogateescape'
 )
 
 # Get INFO from redis
@@ -43,77 +115,602 @@ async def startup_event():
         )
     except ResponseError:
         print("Consumer group already exists.")
-    await rpool.set("stream_splitter", 0)
+    # Other splitter instances may already be running
+    await rpool.set("stream_splitter", 0, nx=True)
     asyncio.create_task(read_streams())
+    asyncio.create_task(flush_severity_counts())
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
-    """ Disconnect all active connections on shutdown. """
-    await rpool.set("stream_splitter", 0)
+    """ Flush pending counts and remove statistics of this consumer on shutdown. """
+    await severity_counter.flush()
+    await rpool.hdel(SPLITTER_STATS_KEY, SPLITTER_CONSUMER_NAME)
+
+class SeverityCounter:
+    """
+    Event counts per severity and time bucket waiting to be flushed.
+
+    Each flush writes one time series sample per severity and bucket with
+    TS.MADD and one ZINCRBY per severity. Series use DUPLICATE_POLICY SUM
+    so partial buckets and other splitter instances add up. Samples
+    TS.MADD rejects, e.g. when ts:{severity} was deleted, are kept in
+    unwritten and their series is created again on the next flush.
+
+    Counts live in memory until flushed, so counts of entries already
+    acknowledged are lost if the process dies within
+    SPLITTER_TS_FLUSH_INTERVAL of their batch.
+    """
+    def __init__(self, bucket_ms: int = SPLITTER_TS_BUCKET_MS):
+        self.bucket_ms = bucket_ms
+        self.counts: Counter = Counter()
+        # Samples already counted in SEVERITIES_KEY but not in time series
+        self.unwritten: Counter = Counter()
+        self.known_series = set()
+
+    def add(self, severity_counts: Counter) -> None:
+        """ Count events per severity to the current bucket. """
+        bucket = int(time() * 1000) // self.bucket_ms * self.bucket_ms
+        for severity, amount in severity_counts.items():
+            self.counts[(severity, bucket)] += amount
+
+    async def ensure_series(self, severity: str) -> None:
+        """ Create time series for severity or make it sum duplicates. """
+        key = f"ts:{severity}"
+        try:
+            await rpool.ts().create(
+                key,
+                labels={'log_level': severity, 'type': 'logs'},
+                duplicate_policy="SUM"
+            )
+        except ResponseError:
+            await rpool.ts().alter(key, duplicate_policy="SUM")
+
+    async def flush(self) -> None:
+        """ Write counted buckets to Redis. """
+        if not self.counts and not self.unwritten:
+            return
+        counts, self.counts = self.counts, Counter()
+        unwritten, self.unwritten = self.unwritten, Counter()
+        try:
+            samples = counts + unwritten
+            totals = Counter()
+            for (severity, _), amount in counts.items():
+                totals[severity] += amount
+            new_severities = {severity for severity, _ in samples} - self.known_series
+            for severity in new_severities:
+                await self.ensure_series(severity)
+
+            async with rpool.pipeline(transaction=True) as pipe:
+                pipe.ts().madd([
+                    (f"ts:{severity}", bucket, amount)
+                    for (severity, bucket), amount in samples.items()
+                ])
+                for severity, amount in totals.items():
+                    pipe.zincrby(
+                        name=SEVERITIES_KEY,
+                        amount=amount,
+                        value=severity
+                    )
+                if new_severities:
+                    pipe.publish(WS_CONTROL_CHANNEL, REFRESH_STREAMS_MESSAGE)
+                results = await pipe.execute()
+        except redis.exceptions.RedisError:
+            # Keep counts for the next flush
+            self.counts.update(counts)
+            self.unwritten.update(unwritten)
+            raise
+        # Only after the refresh was published, retried on failure
+        self.known_series.update(new_severities)
+
+        # TS.MADD reports errors per sample
+        failed = set()
+        for ((severity, bucket), amount), reply in zip(samples.items(), results[0]):
+            if isinstance(reply, ResponseError):
+                failed.add(severity)
+                self.unwritten[(severity, bucket)] += amount
+        if failed:
+            print(f"Time series samples failed for {', '.join(sorted(failed))}, retrying")
+            self.known_series -= failed
+
+severity_counter = SeverityCounter()
+
+async def flush_severity_counts():
+    """ Periodically flush severity counts. """
+    while True:
+        await asyncio.sleep(SPLITTER_TS_FLUSH_INTERVAL)
+        try:
+            await severity_counter.flush()
+        except redis.exceptions.RedisError as err:
+            print(f"Severity count flush failed: {err}")
+
+class SplitterStats:
+    """ Processing statistics of this splitter consumer. """
+    def __init__(self, window: float = 10):
+        self.started = time()
+        self.processed = 0
+        self.claimed = 0
+        self.batch_size = SPLITTER_BATCH_SIZE
+        self.window = window
+        self.recent: deque = deque()
+        self.latencies: deque = deque(maxlen=1000)
 
+    def record(self, n: int, latency: float = None) -> None:
+        """ Record n processed entries and seconds from read to commit. """
+        now = time()
+        self.processed += n
+        self.recent.append((now, n))
+        if latency is not None:
+            self.latencies.append(latency)
+        while self.recent and self.recent[0][0] < now - self.window:
+            self.recent.popleft()
 
-async def split_by_severity(id, payload):
-    event = json.loads(payload["json"])
+    def rate(self) -> float:
+        """ Return entries processed per second over the window. """
+        now = time()
+        recent = sum(n for ts, n in self.recent if ts >= now - self.window)
+        elapsed = min(self.window, now - self.started)
+        return round(recent / elapsed, 1) if elapsed > 0 else 0
+
+    def latency_ms(self) -> dict:
+        """ Return percentiles of recent batch latencies in milliseconds. """
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+        return {
+            f"p{p}": round(latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000, 2)
+            for p in (50, 90, 99)
+        }
+
+    def snapshot(self) -> dict:
+        """ Return statistics as dictionary. """
+        return {
+            "processed": self.processed,
+            "claimed": self.claimed,
+            "rate": self.rate(),
+            "batch_size": self.batch_size,
+            "batch_latency_ms": self.latency_ms(),
+            "updated": time()
+        }
+
+stats = SplitterStats()
+
+def trim_risk(lag) -> bool:
+    """ Return True if lag is at risk of being trimmed from the stream. """
+    return lag is not None and lag > REDIS_STREAM_MAXLEN * SPLITTER_TRIM_RISK_RATIO
+
+async def group_lag():
+    """
+    Return entries of REDIS_STREAM_NAME not yet delivered to the group.
+    None if Redis can't tell, like Redis 6 or after entries were deleted.
+    """
+    for group in await rpool.xinfo_groups(REDIS_STREAM_NAME):
+        if group["name"] == REDIS_CONSUMER_GROUP:
+            return group.get("lag")
+    return None
+
+class BatchSizer:
+    """ Adapt batch size to lag of the group and latency of Redis. """
+    def __init__(self, size: int = SPLITTER_BATCH_SIZE):
+        self.size = size
+        self.lag = None
+        self.trim_risk = False
+
+    def update(self, lag, full: bool, rtt_ms: float) -> int:
+        """
+        Update size from lag, whether the last read filled its batch and
+        milliseconds Redis took to report the lag. Returns the new size.
+        """
+        self.lag = lag
+        at_risk = trim_risk(lag)
+        if at_risk and not self.trim_risk:
+            print(f"Stream splitter lag {lag} at risk of trimming")
+        self.trim_risk = at_risk
+        # Without lag from Redis a full batch means there is more to read
+        behind = lag > self.size * SPLITTER_CONCURRENCY if lag is not None else full
+        if at_risk:
+            # Losing entries to trimming is worse than a slow Redis
+            self.size = SPLITTER_BATCH_MAX
+        elif behind and rtt_ms < SPLITTER_SLOW_REDIS_MS:
+            self.size = min(SPLITTER_BATCH_MAX, self.size * 2)
+        else:
+            self.size = max(SPLITTER_BATCH_MIN, self.size // 2)
+        stats.batch_size = self.size
+        return self.size
+
+batch_sizer = BatchSizer()
+
+@app.get("/api/splitter/stats", response_class=JSONResponse)
+async def splitter_stats():
+    """ Get lag of the consumer group and per-consumer pending entries and rate. """
+    result = {"group": {}, "consumers": {}}
+    try:
+        for group in await rpool.xinfo_groups(REDIS_STREAM_NAME):
+            if group["name"] == REDIS_CONSUMER_GROUP:
+                result["group"] = {
+                    "pending": group.get("pending"),
+                    "lag": group.get("lag"),
+                    "trim_risk": trim_risk(group.get("lag")),
+                    "stream_maxlen": REDIS_STREAM_MAXLEN,
+                    "last_delivered_id": group.get("last-delivered-id")
+                }
+        consumers = await rpool.xinfo_consumers(REDIS_STREAM_NAME, REDIS_CONSUMER_GROUP)
+    except ResponseError:
+        return JSONResponse(result)
+
+    published = await rpool.hgetall(SPLITTER_STATS_KEY)
+    for consumer in consumers:
+        name = consumer["name"]
+        result["consumers"][name] = {
+            "pending": consumer["pending"],
+            "idle": consumer["idle"],
+            **json.loads(published.get(name, "{}"))
+        }
+    return JSONResponse(result)
+
+async def publish_stats(consumername: str) -> None:
+    """ Publish statistics of this consumer for the stats endpoint. """
+    await rpool.hset(SPLITTER_STATS_KEY, consumername, json.dumps(stats.snapshot()))
+
+
+def decode_event(payload: dict) -> dict:
+    """
+    Decode stream entry fields to event dictionary.
+    Entries have either a json field, a msgpack field or one field per
+    event attribute.
+    """
+    if "json" in payload:
+        return json.loads(payload["json"])
+    if "msgpack" in payload:
+        return msgpack.unpackb(payload["msgpack"].encode('utf-8', 'surrogateescape'))
+    event = dict(payload)
+    if "timestamp" in event:
+        # Parses the number as int or float
+        event["timestamp"] = json.loads(event["timestamp"])
+    return event
+
+def log_partition(stream_id: str) -> int:
+    """ Return partition of stream entry from the time in its ID. """
+    seconds = int(stream_id.split('-', 1)[0]) // 1000
+    return seconds - seconds % LOG_PARTITION_SECONDS
+
+def split_by_severity(pipe, id, payload, event, partition):
+    """ Queue stream and JSON writes for a single event to pipe. """
     severity_stream = f"{event['log_level'].lower()}"
-    beginning_of_today = datetime.today().date().strftime('%s')
-    await rpool.xadd(
+    # Severity streams keep the encoding of the source entry
+    pipe.xadd(
         name=severity_stream,
         id='*',
-        fields={'json': payload["json"]},
-        maxlen=2000000,
+        fields=payload,
+        maxlen=SEVERITY_STREAM_MAXLEN,
         approximate=True
     )
 
-    sev_count = await rpool.zincrby(
-        name='severities',
-        amount=1,
-        value=severity_stream
+    pipe.json().set(
+        f"{LOG_PREFIX}{partition}:{id}",
+        '$',
+        event
     )
 
-    await rpool.ts().add(
-        f"ts:{severity_stream}",
-        '*',
-        sev_count,
-        labels={'log_level': severity_stream, 'type': 'logs'},
-        duplicate_policy="LAST"
-    )
+async def process_batch(stream_name, entries):
+    """
+    Split batch of stream entries to severities.
 
-    await rpool.json().set(
-        f"logs:{beginning_of_today}:{id}",
-        '$',
-        event
+    Writes of the whole batch and a single XACK for all of its IDs are
+    sent as one MULTI/EXEC transaction. If the splitter dies before the
+    transaction the entries stay pending and are processed again.
+    Severity counts are aggregated in severity_counter.
+    Documents go to the partition of their stream ID, so a retried entry
+    overwrites its earlier document.
+    """
+    return await commit_batch(stream_name, *prepare_batch(entries))
+
+def prepare_batch(entries) -> tuple:
+    """ Decode batch of stream entries, returns IDs and valid events. """
+    ids = []
+    events = []
+    for stream_id, payload in entries:
+        ids.append(stream_id)
+        # Pending entries trimmed from the stream have no payload
+        if payload is None:
+            continue
+        try:
+            event = decode_event(payload)
+            severity = event['log_level'].lower()
+        except (ValueError, KeyError, TypeError, AttributeError) as err:
+            print(f"Skipping invalid entry {stream_id}: {err}")
+            continue
+        events.append((stream_id, payload, event, severity))
+    return ids, events
+
+async def commit_batch(stream_name, ids, events):
+    """ Write prepared batch and acknowledge it in one transaction. """
+    async with rpool.pipeline(transaction=True) as pipe:
+        partitions = queue_batch(pipe, stream_name, ids, events)
+        results = await pipe.execute()
+    await batch_committed(partitions, events, results)
+    return len(ids)
+
+def queue_batch(pipe, stream_name, ids, events) -> dict:
+    """ Queue writes and XACK of prepared batch to pipe, returns its partitions. """
+    partitions = {}
+    for stream_id, payload, event, _ in events:
+        partition = log_partition(stream_id)
+        partitions[partition] = partition + LOG_PARTITION_SECONDS
+        split_by_severity(pipe, stream_id, payload, event, partition)
+    if partitions:
+        pipe.zadd(LOG_PARTITIONS_KEY, partitions, nx=True)
+    pipe.xack(stream_name, REDIS_CONSUMER_GROUP, *ids)
+    return partitions
+
+async def batch_committed(partitions, events, results) -> None:
+    """ Announce new partitions and count severities of committed batch. """
+    # ZADD NX result is the number of new partitions
+    if partitions and results[-2]:
+        await announce_partitions(partitions)
+    severity_counter.add(Counter(severity for _, _, _, severity in events))
+
+async def announce_partitions(partitions) -> None:
+    """ Tell search that partitions of a batch may be new. """
+    try:
+        for partition in partitions:
+            await rpool.publish(LOG_PARTITIONS_CHANNEL, partition)
+    except redis.exceptions.RedisError as err:
+        # Documents are committed, search finds the partition on its next check
+        print(f"Partition announcement failed: {err}")
+
+class BatchWriters:
+    """
+    Writer tasks processing batches from a bounded queue.
+
+    Batches are decoded and prepared concurrently and their transactions
+    are pipelined on one connection in the order they were read, so
+    severity streams keep the order of the source stream while up to
+    concurrency transactions are in flight. Each batch is written and
+    acknowledged in its own transaction, so an entry is never
+    acknowledged before its writes. A failed batch stays pending; failed
+    is set and later batches not sent yet are left pending too, so the
+    reader can drain the queue and read the pending entries again in
+    order.
+    """
+    def __init__(self, concurrency: int = SPLITTER_CONCURRENCY):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        self.failed = False
+        self.connection = rpool.connection_pool.make_connection()
+        # Sequence numbers of batches read, sent and replied
+        self.read = 0
+        self.sent = 0
+        self.replied = 0
+        self.send_turn = asyncio.Condition()
+        self.reply_turn = asyncio.Condition()
+        self.tasks = [asyncio.create_task(self.write()) for _ in range(concurrency)]
+
+    async def put(self, stream_name: str, entries: list) -> None:
+        """ Queue batch, waits while all writers are busy. """
+        await self.queue.put((stream_name, entries, perf_counter(), self.read))
+        self.read += 1
+
+    async def write(self) -> None:
+        """ Process queued batches, sending them in read order. """
+        while True:
+            stream_name, entries, read_at, sequence = await self.queue.get()
+            try:
+                await self.commit(stream_name, entries, read_at, sequence)
+            finally:
+                self.queue.task_done()
+
+    async def commit(self, stream_name: str, entries: list, read_at: float, sequence: int) -> None:
+        """ Prepare batch, send it on its turn and wait for its reply on its turn. """
+        commands = None
+        try:
+            ids, events = prepare_batch(entries)
+            pipe = rpool.pipeline(transaction=True)
+            partitions = queue_batch(pipe, stream_name, ids, events)
+            commands = [("MULTI",), *(args for args, _ in pipe.command_stack), ("EXEC",)]
+        except Exception as err:
+            print(f"Stream splitter batch failed: {err!r}")
+
+        sent = False
+        async with self.send_turn:
+            await self.send_turn.wait_for(lambda: self.sent == sequence)
+            try:
+                if commands is None:
+                    self.failed = True
+                elif not self.failed:
+                    await self.connection.send_packed_command(
+                        self.connection.pack_commands(commands), check_health=False)
+                    sent = True
+            except Exception as err:
+                print(f"Stream splitter batch failed: {err!r}")
+                self.failed = True
+            finally:
+                self.sent += 1
+                self.send_turn.notify_all()
+
+        results = None
+        async with self.reply_turn:
+            await self.reply_turn.wait_for(lambda: self.replied == sequence)
+            try:
+                if sent:
+                    results = await self.read_transaction(len(commands))
+            except Exception as err:
+                print(f"Stream splitter batch failed: {err!r}")
+                self.failed = True
+                if not isinstance(err, ResponseError):
+                    # Replies of batches sent after this one are lost too
+                    await self.connection.disconnect()
+            finally:
+                self.replied += 1
+                self.reply_turn.notify_all()
+
+        if results is not None:
+            try:
+                await batch_committed(partitions, events, results)
+            except Exception as err:
+                print(f"Stream splitter batch follow-up failed: {err!r}")
+            stats.record(len(ids), perf_counter() - read_at)
+
+    async def read_transaction(self, count: int) -> list:
+        """ Read replies of a MULTI/EXEC block of count commands, returns EXEC results. """
+        error = None
+        # MULTI and QUEUED replies, queuing errors abort the EXEC
+        for _ in range(count - 1):
+            try:
+                await self.connection.read_response()
+            except ResponseError as err:
+                error = error or err
+        try:
+            results = await self.connection.read_response()
+        except redis.exceptions.ExecAbortError as err:
+            raise (error or err) from err
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    async def join(self) -> None:
+        """ Wait until queued and in-flight batches are done. """
+        await self.queue.join()
+
+    async def close(self) -> None:
+        """ Stop writer tasks and close their connection. """
+        for task in self.tasks:
+            task.cancel()
+        await self.connection.disconnect()
+
+async def load_function_library() -> None:
+    """ Load stream splitter Redis Functions library. """
+    with open(FUNCTION_LIBRARY_FILE, 'r') as library:
+        await rpool.function_load(library.read(), replace=True)
+
+async def split_with_function(consumername: str, count: int = SPLITTER_BATCH_SIZE):
+    """
+    Split next batch of up to count new entries inside Redis with split_batch.
+    Returns number of processed entries and ID of the last one.
+    """
+    processed, last_id = await rpool.fcall(
+        'split_batch',
+        3,
+        REDIS_STREAM_NAME,
+        LOG_PARTITIONS_KEY,
+        SEVERITIES_KEY,
+        REDIS_CONSUMER_GROUP,
+        consumername,
+        count,
+        SEVERITY_STREAM_MAXLEN,
+        LOG_PREFIX,
+        LOG_PARTITION_SECONDS,
+        SPLITTER_TS_BUCKET_MS,
+        WS_CONTROL_CHANNEL,
+        LOG_PARTITIONS_CHANNEL
     )
+    return processed, last_id
+
+async def reclaim_pending(consumername: str) -> int:
+    """
+    Claim entries other consumers have left pending for longer than
+    SPLITTER_CLAIM_IDLE_MS and process them. Removes consumers with
+    nothing pending that have been idle for SPLITTER_CONSUMER_TTL_MS.
+    Returns number of processed entries.
+    """
+    processed = 0
+    start_id = "0-0"
+    while True:
+        res = await rpool.xautoclaim(
+            name=REDIS_STREAM_NAME,
+            groupname=REDIS_CONSUMER_GROUP,
+            consumername=consumername,
+            min_idle_time=SPLITTER_CLAIM_IDLE_MS,
+            start_id=start_id,
+            count=SPLITTER_BATCH_SIZE
+        )
+        start_id, entries = res[0], res[1]
+        if entries:
+            processed += await process_batch(REDIS_STREAM_NAME, entries)
+        if start_id == "0-0":
+            break
+
+    for consumer in await rpool.xinfo_consumers(REDIS_STREAM_NAME, REDIS_CONSUMER_GROUP):
+        if (consumer["name"] != consumername
+                and consumer["pending"] == 0
+                and consumer["idle"] > SPLITTER_CONSUMER_TTL_MS):
+            await rpool.xgroup_delconsumer(REDIS_STREAM_NAME, REDIS_CONSUMER_GROUP, consumer["name"])
+            await rpool.hdel(SPLITTER_STATS_KEY, consumer["name"])
+    return processed
 
 async def read_streams():
-    """ Read entries from subscribed streams for client_id. """
+    """ Read entries from REDIS_STREAM_NAME and split them in batches. """
 
-    consumername = f"{REDIS_CONSUMER_GROUP}-streamreader"
-    stream_id = ">"
+    consumername = SPLITTER_CONSUMER_NAME
+    # Start from entries delivered earlier but never acknowledged,
+    # then switch to new entries.
+    stream_id = "0"
+    last_claim = 0
+    last_stats = 0
+    last_lag = 0
+    full = False
+    function_loaded = False
+    last_function_id = "$"
+    writers = BatchWriters()
     while True:
-        splitter_enabled = await rpool.get("stream_splitter")
+        splitter_enabled, engine = await rpool.mget("stream_splitter", "stream_splitter_engine")
         if splitter_enabled == "0":
             await asyncio.sleep(0.5)
             continue
-        data = await rpool.xreadgroup(
-            groupname=REDIS_CONSUMER_GROUP,
-            consumername=consumername,
-            streams={REDIS_STREAM_NAME: ">"},
-            count=100,
-            block=1000)
-        if len(data) > 0:
-            for batch in data:
-                stream_name = batch[0]
-                for entry in batch[1]:
-                    stream_id = entry[0]
-                    stream_payload = entry[1] # json
-                    await split_by_severity(stream_id, stream_payload)
-                    await rpool.xack(
-                        stream_name, # Stream name
-                        REDIS_CONSUMER_GROUP,
-                        stream_id # Stream ID
-                    )
-        #except redis.exceptions.DataError:
-        #    # If no streams are being consumed just return and try again later
-        #    pass
+        try:
+            if time() - last_claim > SPLITTER_CLAIM_INTERVAL:
+                last_claim = time()
+                claimed = await reclaim_pending(consumername)
+                stats.claimed += claimed
+                stats.record(claimed)
+            if time() - last_stats > SPLITTER_STATS_INTERVAL:
+                last_stats = time()
+                await publish_stats(consumername)
+            if time() - last_lag > SPLITTER_LAG_INTERVAL:
+                last_lag = time()
+                lag = await group_lag()
+                batch_sizer.update(lag, full, (time() - last_lag) * 1000)
 
+            if engine == "functions" and stream_id == ">":
+                if not function_loaded:
+                    await load_function_library()
+                    function_loaded = True
+                processed, last_id = await split_with_function(consumername, batch_sizer.size)
+                stats.record(processed)
+                full = processed >= batch_sizer.size
+                if processed:
+                    last_function_id = last_id
+                if not full:
+                    # Wait for new entries without consuming them
+                    await rpool.xread(
+                        streams={REDIS_STREAM_NAME: last_function_id},
+                        count=1,
+                        block=SPLITTER_BLOCK_MS)
+                continue
 
+            if writers.failed:
+                # Retry unacknowledged entries after a failed batch
+                stream_id = "0"
+            if stream_id == "0":
+                # Pending entries include batches still being written,
+                # those after a failed batch are skipped
+                await writers.join()
+                writers.failed = False
+            data = await rpool.xreadgroup(
+                groupname=REDIS_CONSUMER_GROUP,
+                consumername=consumername,
+                streams={REDIS_STREAM_NAME: stream_id},
+                count=batch_sizer.size,
+                block=SPLITTER_BLOCK_MS)
+            if stream_id == "0" and not any(batch[1] for batch in data):
+                stream_id = ">"
+                continue
+            full = any(len(batch[1]) >= batch_sizer.size for batch in data)
+            for batch in data:
+                if batch[1]:
+                    await writers.put(batch[0], batch[1])
+        except redis.exceptions.RedisError as err:
+            # Retry unacknowledged entries after a failed batch
+            print(f"Stream splitter error: {err}")
+            stream_id = "0"
+            function_loaded = False
+            await asyncio.sleep(1)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Tests for the split_batch Redis Function.
+
+Needs Redis 7 with RedisJSON and RedisTimeSeries at REDIS_HOST:REDIS_PORT,
+e.g. redis-stack-server, and are skipped otherwise. Keys are written to
+database SPLITTER_TEST_DB (default 15) and removed afterwards; the
+function library is loaded server wide like the splitter does.
+
+Usage:
+    python -m unittest test_stream_splitter
+"""
+
+import asyncio
+import json
+import unittest
+from os import environ, path
+
+import msgpack
+import redis.asyncio
+import redis.exceptions
+
+from streamsplitter import (
+    FUNCTION_LIBRARY_FILE,
+    LOG_PREFIX,
+    REDIS_CONSUMER_GROUP,
+    REDIS_HOST,
+    REDIS_PORT,
+    SEVERITY_STREAM_MAXLEN,
+    SPLITTER_TS_BUCKET_MS,
+    REFRESH_STREAMS_MESSAGE
+)
+
+SPLITTER_TEST_DB = int(environ.get('SPLITTER_TEST_DB') or 15)
+STREAM = "test:splitter:source"
+PARTITIONS_KEY = "test:splitter:partitions"
+SEVERITIES_KEY = "test:splitter:severities"
+CONTROL_CHANNEL = "test:splitter:control"
+PARTITIONS_CHANNEL = "test:splitter:partitions"
+CONSUMER = "test"
+PARTITION_SECONDS = 3600
+
+async def collect(pubsub, seconds: float = 0.5) -> list:
+    """ Return (channel, data) of messages published within seconds. """
+    messages = []
+    deadline = asyncio.get_running_loop().time() + seconds
+    while (timeout := deadline - asyncio.get_running_loop().time()) > 0:
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is not None:
+            messages.append((message["channel"], message["data"]))
+    return messages
+
+class SplitBatchTest(unittest.IsolatedAsyncioTestCase):
+    """ split_batch against a Redis Stack server. """
+
+    async def asyncSetUp(self):
+        self.rconn = redis.asyncio.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=SPLITTER_TEST_DB,
+            decode_responses=True
+        )
+        try:
+            version = (await self.rconn.info("server"))["redis_version"]
+            modules = {module["name"] for module in await self.rconn.module_list()}
+        except redis.exceptions.RedisError as err:
+            await self.rconn.aclose()
+            self.skipTest(f"No Redis at {REDIS_HOST}:{REDIS_PORT}: {err}")
+        if int(version.split(".")[0]) < 7 or not {"ReJSON", "timeseries"} <= modules:
+            await self.rconn.aclose()
+            self.skipTest(f"Needs Redis 7 with RedisJSON and RedisTimeSeries, got {version} {sorted(modules)}")
+        with open(path.join(path.dirname(__file__), FUNCTION_LIBRARY_FILE), 'r') as library:
+            await self.rconn.function_load(library.read(), replace=True)
+        await self.cleanup()
+        await self.rconn.xgroup_create(name=STREAM, groupname=REDIS_CONSUMER_GROUP, mkstream=True)
+
+    async def asyncTearDown(self):
+        await self.cleanup()
+        await self.rconn.aclose()
+
+    async def cleanup(self):
+        """ Delete keys written by the test. """
+        await self.rconn.delete(
+            STREAM, PARTITIONS_KEY, SEVERITIES_KEY,
+            "info", "error", "ts:info", "ts:error")
+        async for key in self.rconn.scan_iter(match=f"{LOG_PREFIX}*"):
+            await self.rconn.unlink(key)
+
+    async def split_batch(self, count: int = 10) -> list:
+        """ Call split_batch like split_with_function does. """
+        return await self.rconn.fcall(
+            'split_batch',
+            3,
+            STREAM,
+            PARTITIONS_KEY,
+            SEVERITIES_KEY,
+            REDIS_CONSUMER_GROUP,
+            CONSUMER,
+            count,
+            SEVERITY_STREAM_MAXLEN,
+            LOG_PREFIX,
+            PARTITION_SECONDS,
+            SPLITTER_TS_BUCKET_MS,
+            CONTROL_CHANNEL,
+            PARTITIONS_CHANNEL
+        )
+
+    async def test_split_batch(self):
+        events = [
+            {"timestamp": 1, "hostname": "web-1", "log_level": "INFO", "message": "a"},
+            {"timestamp": 2, "hostname": "web-2", "log_level": "ERROR", "message": "b"},
+            {"timestamp": 3, "hostname": "web-3", "log_level": "INFO", "message": "c"}
+        ]
+        payloads = [
+            {"json": json.dumps(events[0])},
+            {"msgpack": msgpack.packb(events[1])},
+            {key: str(value) for key, value in events[2].items()}
+        ]
+        ids = [await self.rconn.xadd(STREAM, payload) for payload in payloads]
+        # Not valid, acknowledged without writes
+        ids.append(await self.rconn.xadd(STREAM, {"message": "no log level"}))
+
+        async with self.rconn.pubsub() as pubsub:
+            await pubsub.subscribe(CONTROL_CHANNEL, PARTITIONS_CHANNEL)
+            processed, last_id = await self.split_batch()
+            messages = await collect(pubsub)
+
+        self.assertEqual(processed, 4)
+        self.assertEqual(last_id, ids[-1])
+
+        # Severity streams get the source fields in order
+        info = await self.rconn.xrange("info")
+        self.assertEqual([fields for _, fields in info], [payloads[0], payloads[2]])
+        self.assertEqual(await self.rconn.xlen("error"), 1)
+
+        # Documents are stored in the partition of their stream ID
+        partitions = set()
+        for stream_id, event in zip(ids, events):
+            seconds = int(stream_id.split("-")[0]) // 1000
+            partition = seconds - seconds % PARTITION_SECONDS
+            partitions.add(partition)
+            document = await self.rconn.json().get(f"{LOG_PREFIX}{partition}:{stream_id}")
+            self.assertEqual(document["log_level"], event["log_level"])
+            self.assertEqual(document["message"], event["message"])
+            self.assertEqual(document["timestamp"], event["timestamp"])
+        self.assertEqual(
+            await self.rconn.zrange(PARTITIONS_KEY, 0, -1, withscores=True),
+            [(str(partition), partition + PARTITION_SECONDS) for partition in sorted(partitions)])
+
+        # Time series sum the events of each severity
+        info_samples = await self.rconn.ts().range("ts:info", "-", "+")
+        self.assertEqual(sum(value for _, value in info_samples), 2)
+        error_samples = await self.rconn.ts().range("ts:error", "-", "+")
+        self.assertEqual(sum(value for _, value in error_samples), 1)
+        self.assertEqual(await self.rconn.zscore(SEVERITIES_KEY, "info"), 2)
+
+        # Every entry is acknowledged
+        pending = await self.rconn.xpending(STREAM, REDIS_CONSUMER_GROUP)
+        self.assertEqual(pending["pending"], 0)
+
+        # New severities and partitions are announced once
+        self.assertIn((CONTROL_CHANNEL, REFRESH_STREAMS_MESSAGE), messages)
+        self.assertEqual(
+            sorted(data for channel, data in messages if channel == PARTITIONS_CHANNEL),
+            sorted(str(partition) for partition in partitions))
+
+        # Nothing new left
+        self.assertEqual(await self.split_batch(), [0, ""])
+
+    async def test_known_severity_not_announced(self):
+        await self.rconn.xadd(STREAM, {"json": json.dumps({"log_level": "INFO", "message": "a"})})
+        await self.split_batch()
+        await self.rconn.xadd(STREAM, {"json": json.dumps({"log_level": "INFO", "message": "b"})})
+        async with self.rconn.pubsub() as pubsub:
+            await pubsub.subscribe(CONTROL_CHANNEL)
+            await self.split_batch()
+            messages = await collect(pubsub)
+        self.assertEqual(messages, [])
+        info_samples = await self.rconn.ts().range("ts:info", "-", "+")
+        self.assertEqual(sum(value for _, value in info_samples), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -60,7 +60,8 @@ class TimeSeriesMrangeQuery(BaseModel):
     """ TS.MRANGE query definition. """
     from_time: Any = "-"
     to_time: Any = "+"
-    aggregation_type: str = "count"
+    # Samples are event counts per bucket written by the stream splitter
+    aggregation_type: str = "sum"
     bucket_size_msec: int = 1000
     filters: List[str] = ["type=logs"]
 